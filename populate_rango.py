@@ -5,7 +5,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE',
 
 import django
 django.setup()
-from rango.models import Category,Page
+from rango.models import Page
+from rango.loader import load_categories, load_pages
 
 def populate():
 
@@ -49,31 +50,19 @@ def populate():
         "Django": {"pages": django_pages, "views":64, "likes":32},
         "Other Frameworks": {"pages": other_pages, "views":32, "likes":16}
     }
-    #Go through cats dictionary, then add each category, then add all associated
-    #pages for that Category
-    for cat, cat_data in cats.items():
-        c = add_cat(cat,cat_data["views"],cat_data["likes"])
-        for p in cat_data["pages"]:
-            add_page(c, p["title"], p["url"],p["views"])
+    #Turn the cats dictionary into rows, then load all categories and then
+    #all pages in bulk. Re-running updates existing rows instead of
+    #duplicating them
+    load_categories({"name": cat, "views": cat_data["views"],
+                     "likes": cat_data["likes"]}
+                    for cat, cat_data in cats.items())
+    load_pages({"category": cat, "title": p["title"], "url": p["url"],
+                "views": p["views"]}
+               for cat, cat_data in cats.items() for p in cat_data["pages"])
 
     #Print out the categories that have been added
-    for c in Category.objects.all():
-        for p in Page.objects.filter(category=c):
-            print("- {0} - {1}".format(str(c), str(p)))
-
-def add_page(cat,title,url,views):
-    p = Page.objects.get_or_create(category=cat, title=title)[0]
-    p.url=url
-    p.views=views
-    p.save()
-    return p
-
-def add_cat(name,views,likes):
-    c = Category.objects.get_or_create(name=name)[0]
-    c.views = views
-    c.likes = likes
-    c.save()
-    return c
+    for p in Page.objects.select_related('category').order_by('category', 'id'):
+        print("- {0} - {1}".format(str(p.category), str(p)))
 
 #Execution starts here
 if __name__ == "__main__":
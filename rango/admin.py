@@ -2,10 +2,14 @@ from django.contrib import admin
 from rango.models import Category,Page,UserProfile
 
 class PageAdmin(admin.ModelAdmin):
-    list_display = ("title","category","url")
+    list_display = ("title","category","url","link_status","last_checked")
+    list_filter = ("link_status",)
 
 class CategoryAdmin(admin.ModelAdmin):
-    prepopulated_fields = {"slug":("name",)}
+    list_display = ("name","slug","page_count","last_page_added")
+    # The slug follows the name (see Category.save); the page stats are
+    # maintained from the pages (see rango.services.refresh_page_stats)
+    readonly_fields = ("slug","page_count","last_page_added")
 
 # Register your models here.
 admin.site.register(Category,CategoryAdmin)
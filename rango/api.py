@@ -0,0 +1,198 @@
+"""
+Read-only JSON API.
+
+    /rango/api/categories/                  all categories, oldest first
+    /rango/api/categories/<slug>/pages/     a category's pages, most viewed first
+    /rango/api/pages/top/                   the most viewed pages
+
+Every response is {"results": [...], "next": <URL or null>}. Lists are
+paged with keyset cursors: "next" is the URL of the following page, and
+?limit= sets the page size (up to RANGO_API_MAX_PAGE_SIZE). ?limit=all
+returns the whole list in one response, for exports.
+
+Responses are streamed. Rows are read with .values().iterator() in
+batches of EXPORT_BATCH_SIZE, each batch its own short keyset query, so
+memory use stays the same however long the list is, and a slow client
+never holds a read open on the database. Each response has an ETag built from
+the version counters in rango.caching, and If-None-Match gets a 304
+without any rows being read.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import (Http404, HttpResponseBadRequest,
+                         StreamingHttpResponse)
+from django.views.decorators.http import condition, require_safe
+from rango.caching import (get_category_pages_version, get_category_version,
+                           get_counters_version, get_pages_version)
+from rango.models import Category, Page
+from rango.services import (PAGE_ORDERING, format_cursor, pages_after,
+                            parse_cursor)
+
+EXPORT_BATCH_SIZE = 2000
+
+CATEGORY_FIELDS = ('id', 'name', 'slug', 'views', 'likes', 'page_count',
+                   'last_page_added')
+PAGE_FIELDS = ('id', 'title', 'url', 'views')
+
+
+class BadRequest(Exception):
+    pass
+
+
+class KeysetList(object):
+    """
+    Rows of a queryset in its order, starting after a cursor, read in
+    batches. seek(queryset, cursor) filters the queryset down to the rows
+    after cursor, and cursor_of(row) gives a row's cursor. After iterating,
+    next_cursor is the cursor to continue from, or None at the end. With
+    no seek the list isn't paged: just the first `limit` rows.
+    """
+
+    def __init__(self, queryset, fields, seek, cursor_of, cursor, limit):
+        self.queryset = queryset
+        self.fields = fields
+        self.seek = seek
+        self.cursor_of = cursor_of
+        self.cursor = cursor
+        self.limit = limit
+        self.next_cursor = None
+
+    def rows(self, cursor):
+        if cursor is None:
+            return self.queryset
+        return self.seek(self.queryset, cursor)
+
+    def __iter__(self):
+        cursor = self.cursor
+        remaining = self.limit
+        while remaining is None or remaining > 0:
+            size = EXPORT_BATCH_SIZE if remaining is None else \
+                min(EXPORT_BATCH_SIZE, remaining)
+            count = 0
+            for row in self.rows(cursor).values(*self.fields)[:size].iterator():
+                count += 1
+                yield row
+            if count < size or self.seek is None:
+                return
+            cursor = self.cursor_of(row)
+            if remaining is not None:
+                remaining -= count
+        # A full page: there is a next one if any row follows
+        if self.rows(cursor).exists():
+            self.next_cursor = cursor
+
+
+def parse_limit(request, default=None):
+    value = request.GET.get('limit')
+    maximum = getattr(settings, 'RANGO_API_MAX_PAGE_SIZE', 1000)
+    if value == 'all':
+        return None
+    if value is None:
+        return default or getattr(settings, 'RANGO_API_PAGE_SIZE', 100)
+    try:
+        limit = int(value)
+    except ValueError:
+        raise BadRequest("limit must be a number or 'all'")
+    if limit < 1:
+        raise BadRequest("limit must be at least 1")
+    return min(limit, maximum)
+
+
+def stream(request, rows):
+    # {"results": [...], "next": ...}, written one row at a time
+    def content():
+        yield '{"results": ['
+        for i, row in enumerate(rows):
+            yield (',' if i else '') + json.dumps(row, cls=DjangoJSONEncoder)
+        next_url = None
+        if rows.next_cursor is not None:
+            query = request.GET.copy()
+            query['after'] = rows.next_cursor
+            next_url = '{0}?{1}'.format(request.path, query.urlencode())
+        yield '], "next": {0}}}'.format(json.dumps(next_url))
+    return StreamingHttpResponse(content(), content_type='application/json')
+
+
+def api_view(versions):
+    """
+    Decorator for the API views: GET and HEAD only, a 400 for BadRequest,
+    and an ETag from the URL and the version counters returned by
+    versions(**view kwargs).
+    """
+    def etag(request, **kwargs):
+        key = [request.get_full_path()] + \
+            [str(v) for v in versions(**kwargs)]
+        return hashlib.md5('|'.join(key).encode('utf-8')).hexdigest()
+
+    def decorator(view):
+        @wraps(view)
+        @require_safe
+        @condition(etag_func=etag)
+        def wrapper(request, **kwargs):
+            try:
+                return view(request, **kwargs)
+            except BadRequest as e:
+                return HttpResponseBadRequest(str(e))
+        return wrapper
+    return decorator
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest("after must be a category id")
+
+
+@api_view(lambda: [get_category_version(), get_pages_version(),
+                   get_counters_version()])
+def categories(request):
+    after = request.GET.get('after')
+    rows = KeysetList(
+        Category.objects.order_by('id'), CATEGORY_FIELDS,
+        seek=lambda queryset, pk: queryset.filter(id__gt=pk),
+        cursor_of=lambda row: row['id'],
+        cursor=parse_id(after) if after else None,
+        limit=parse_limit(request))
+    return stream(request, rows)
+
+
+@api_view(lambda category_name_slug: [
+    get_category_version(), get_category_pages_version(category_name_slug),
+    get_pages_version(), get_counters_version()])
+def category_pages(request, category_name_slug):
+    category_id = Category.objects.filter(slug=category_name_slug) \
+        .values_list('id', flat=True).first()
+    if category_id is None:
+        raise Http404("No such category")
+    after = request.GET.get('after')
+    if after and parse_cursor(after) is None:
+        raise BadRequest("after must be a cursor from a previous response")
+    # Served by the (category, -views, id) index
+    rows = KeysetList(
+        Page.objects.filter(category_id=category_id).order_by(*PAGE_ORDERING),
+        PAGE_FIELDS,
+        seek=pages_after,
+        cursor_of=lambda row: format_cursor(row['views'], row['id']),
+        cursor=after or None,
+        limit=parse_limit(request))
+    return stream(request, rows)
+
+
+@api_view(lambda: [get_pages_version(), get_counters_version()])
+def top_pages(request):
+    # Not paged: the first ?limit= (default 10) pages by views
+    limit = parse_limit(request, default=10)
+    if limit is None:
+        raise BadRequest("use /api/categories/<slug>/pages/ to export pages")
+    rows = KeysetList(
+        Page.objects.order_by(*PAGE_ORDERING).annotate(
+            category_slug=F('category__slug')),
+        PAGE_FIELDS + ('category_slug',),
+        seek=None, cursor_of=None, cursor=None, limit=limit)
+    return stream(request, rows)
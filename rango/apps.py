@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RangoConfig(AppConfig):
     name = 'rango'
+
+    def ready(self):
+        # Connect model signal handlers (cache invalidation etc.)
+        import rango.signals
+        # Tune database connections as they are opened
+        import rango.db
+
+        if getattr(settings, 'RANGO_TEMPLATE_WARMUP', False):
+            from rango.template_loaders import warm_templates
+            warm_templates()
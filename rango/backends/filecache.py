@@ -0,0 +1,50 @@
+"""
+File-based cache whose incr() and add() are atomic across processes.
+
+Django's FileBasedCache implements incr() as a get and a set, so two
+processes bumping a version counter (rango.caching) at the same moment can
+both write the same number, and one of the invalidations is lost. Here
+both run under an exclusive lock on a file in the cache directory.
+
+Django's version also lists the whole cache directory on every set() to
+decide whether to cull, which gets slower the more the cache holds. This
+one checks at most once every CULL_INTERVAL seconds per process.
+
+    'BACKEND': 'rango.backends.filecache.FileBasedCache'
+"""
+import os
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import \
+    FileBasedCache as BaseFileBasedCache
+from rango.sessions import FileLock
+
+CULL_INTERVAL = 60
+
+
+class FileBasedCache(BaseFileBasedCache):
+
+    def __init__(self, dir, params):
+        super(FileBasedCache, self).__init__(dir, params)
+        self._last_cull = 0
+
+    def lock(self):
+        self._createdir()
+        return FileLock(os.path.join(self._dir, '.lock'))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self.lock():
+            return super(FileBasedCache, self).add(key, value, timeout,
+                                                   version)
+
+    def incr(self, key, delta=1, version=None):
+        with self.lock():
+            return super(FileBasedCache, self).incr(key, delta, version)
+
+    def _cull(self):
+        now = time.time()
+        if now - self._last_cull < CULL_INTERVAL:
+            return
+        self._last_cull = now
+        super(FileBasedCache, self)._cull()
@@ -0,0 +1,22 @@
+"""
+SQLite backend whose transactions take the write lock when they begin.
+
+With SQLite's default (deferred) BEGIN, a transaction that reads and then
+writes has to upgrade its lock part way through. If another connection got
+the write lock first, SQLite can't wait for it without deadlocking, so it
+fails at once with "database is locked" whatever the busy timeout. BEGIN
+IMMEDIATE takes the write lock up front, so concurrent write transactions
+wait their turn for up to the timeout in OPTIONS instead.
+
+    'ENGINE': 'rango.backends.sqlite3'
+
+Use it for the database that takes writes; reads outside transactions are
+unaffected.
+"""
+from django.db.backends.sqlite3.base import DatabaseWrapper as BaseDatabaseWrapper
+
+
+class DatabaseWrapper(BaseDatabaseWrapper):
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
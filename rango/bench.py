@@ -0,0 +1,105 @@
+import contextlib
+import time
+
+from django.db import connection, connections, transaction
+from django.template.defaultfilters import slugify
+from rango.models import Category, Page
+from rango.services import refresh_page_stats
+from rango.stats import percentile, summarize  # noqa: F401
+
+# Helpers shared by the benchmark management commands
+
+
+@contextlib.contextmanager
+def scratch_database(verbosity=0, name=None):
+    # Run against a throwaway test database so seeding millions of rows
+    # never touches the real one. SQLite's is in memory unless a file name
+    # is given (needed to share it between processes).
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if name:
+        connection.settings_dict['TEST']['NAME'] = name
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True,
+                                       serialize=False)
+    # Aliases that mirror the default database (the read alias) must use
+    # the scratch database too
+    mirrors = [(mirror, mirror.settings_dict['NAME'])
+               for mirror in connections.all()
+               if mirror.settings_dict['TEST'].get('MIRROR') == connection.alias]
+    for mirror, _ in mirrors:
+        mirror.close()
+        mirror.settings_dict['NAME'] = connection.settings_dict['NAME']
+    try:
+        yield
+    finally:
+        for mirror, mirror_name in mirrors:
+            mirror.close()
+            mirror.settings_dict['NAME'] = mirror_name
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+
+
+def seed_catalogue(pages, categories=None, chunk_size=10000):
+    # Generate a synthetic catalogue with bulk inserts. View and like counts
+    # are spread out so ordering by them does real work.
+    categories = categories or max(1, pages // 100)
+
+    with transaction.atomic():
+        Category.objects.bulk_create(
+            [Category(name="Category {0}".format(i),
+                      slug=slugify("Category {0}".format(i)),
+                      views=(i * 7919) % 10007,
+                      likes=(i * 104729) % 1009)
+             for i in range(categories)])
+    category_ids = list(Category.objects.values_list('id', flat=True))
+
+    for start in range(0, pages, chunk_size):
+        stop = min(start + chunk_size, pages)
+        with transaction.atomic():
+            Page.objects.bulk_create(
+                [Page(category_id=category_ids[i % len(category_ids)],
+                      title="Page {0}".format(i),
+                      url="http://example.com/{0}/".format(i),
+                      views=(i * 2654435761) % 1000003)
+                 for i in range(start, stop)])
+    refresh_page_stats()
+    return categories, pages
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def format_stats(name, stats):
+    return "{0:<32} mean {1:9.3f} ms  p50 {2:9.3f} ms  p99 {3:9.3f} ms".format(
+        name, stats['mean'] * 1000, stats['p50'] * 1000, stats['p99'] * 1000)
+
+
+# Dataset sizes for the view benchmarks, by name
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare benchmark results with a stored baseline. Both map scenario
+    names to {'p50': seconds, 'p99': seconds, 'queries': n, ...}. Returns a
+    list of messages, one per regression: p50 latency up by more than
+    tolerance (a fraction), or more queries per request than before.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result['p50'] > old['p50'] * (1 + tolerance):
+            regressions.append("{0}: p50 {1:.3f} ms, baseline {2:.3f} ms".format(
+                name, result['p50'] * 1000, old['p50'] * 1000))
+        if result['queries'] > old['queries']:
+            regressions.append("{0}: {1} queries, baseline {2}".format(
+                name, result['queries'], old['queries']))
+    return regressions
@@ -0,0 +1,110 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from rango.models import Category
+
+# Version counter for the set of categories. Anything cached that depends
+# on the categories includes this number in its key, so bumping it
+# invalidates all of those entries at once.
+CATEGORY_VERSION_KEY = 'rango:category_version'
+
+# Bumped on any change to pages or to the leaderboards (the index page)
+PAGES_VERSION_KEY = 'rango:pages_version'
+
+# Bumped when the pages of one category change (its category page)
+CATEGORY_PAGES_VERSION_KEY = 'rango:category_pages_version:{0}'
+
+# Bumped whenever batched view/like counts are written (rango.counters).
+# Only the JSON API depends on it: pages show counts that may lag a little.
+COUNTERS_VERSION_KEY = 'rango:counters_version'
+
+# Stale versions simply expire after this long
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Counter missing (first use or evicted). Seed it from the clock so
+        # it can never go back to a number an older cached entry used.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Counter was evicted, so start a fresh one
+        return get_version(key)
+
+
+def get_category_version():
+    return get_version(CATEGORY_VERSION_KEY)
+
+
+def bump_category_version():
+    return bump_version(CATEGORY_VERSION_KEY)
+
+
+def get_pages_version():
+    return get_version(PAGES_VERSION_KEY)
+
+
+def bump_pages_version():
+    return bump_version(PAGES_VERSION_KEY)
+
+
+def get_category_pages_version(slug):
+    return get_version(CATEGORY_PAGES_VERSION_KEY.format(slug))
+
+
+def bump_category_pages_version(slug):
+    return bump_version(CATEGORY_PAGES_VERSION_KEY.format(slug))
+
+
+def get_counters_version():
+    return get_version(COUNTERS_VERSION_KEY)
+
+
+def bump_counters_version():
+    return bump_version(COUNTERS_VERSION_KEY)
+
+
+def get_category_list(after=None, limit=None):
+    """
+    One chunk of the sidebar's categories in name order, starting after the
+    category named `after`: (categories, next_cursor). next_cursor is the
+    `after` for the following chunk, or None if this is the last.
+
+    Categories are plain dicts with the URL already reversed. Each chunk is
+    one range scan on the unique index on name, and is served from the
+    cache until a category changes.
+    """
+    limit = limit or getattr(settings, 'RANGO_SIDEBAR_SIZE', 50)
+    key = 'rango:category_list:{0}:{1}:{2}'.format(
+        get_category_version(), limit,
+        hashlib.md5(after.encode('utf-8')).hexdigest() if after else '')
+    chunk = cache.get(key)
+    if chunk is None:
+        queryset = Category.objects.order_by('name')
+        if after:
+            queryset = queryset.filter(name__gt=after)
+        rows = list(queryset.values_list(
+            'name', 'slug', 'page_count', 'last_page_added')[:limit + 1])
+        cats = [category_entry(*row) for row in rows[:limit]]
+        chunk = (cats, cats[-1]['name'] if len(rows) > limit else None)
+        cache.set(key, chunk, CACHE_TIMEOUT)
+    return chunk
+
+
+def category_entry(name, slug, page_count, last_page_added):
+    return {'name': name,
+            'slug': slug,
+            'url': reverse('show_category', args=[slug]),
+            'page_count': page_count,
+            'last_page_added': last_page_added}
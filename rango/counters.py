@@ -0,0 +1,128 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+# Sent after a batch of increments has been written. ``updates`` maps
+# (model, field, pk) to the amount that was added.
+counters_flushed = Signal(providing_args=['updates'])
+
+# Keep the IN (...) lists under SQLite's limit on query parameters
+UPDATE_BATCH_SIZE = 500
+
+
+class ViewCounter(object):
+    """
+    Accumulates counter increments (page views, category views, ...) in
+    memory and writes them to the database in batches with F() expressions,
+    so recording a view never waits for a write.
+    """
+
+    def __init__(self, flush_interval=None, max_pending=None):
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'RANGO_COUNTER_FLUSH_INTERVAL', 5)
+
+    @property
+    def max_pending(self):
+        if self._max_pending is not None:
+            return self._max_pending
+        return getattr(settings, 'RANGO_COUNTER_MAX_PENDING', 10000)
+
+    def record(self, model, pk, field='views', amount=1):
+        # An interval of 0 turns batching off and writes straight through
+        if self.flush_interval <= 0:
+            self._write({(model, field, pk): amount})
+            return
+
+        with self._lock:
+            self._pending[(model, field, pk)] += amount
+            full = len(self._pending) >= self.max_pending
+            self._start_flusher()
+
+        # Memory is bounded by the number of distinct counters, so once too
+        # many are waiting the flusher is woken early to write them out
+        if full:
+            self._wake.set()
+
+    def pending(self, model, pk, field='views'):
+        # Increments recorded for an object but not written yet
+        with self._lock:
+            return self._pending.get((model, field, pk), 0)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        if not pending:
+            return 0
+
+        try:
+            self._write(pending)
+        except Exception:
+            # Put the increments back so they are retried on the next flush
+            with self._lock:
+                for key, amount in pending.items():
+                    self._pending[key] += amount
+            raise
+        return len(pending)
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
+
+    def _write(self, updates):
+        # Objects that got the same increment share a single UPDATE
+        batches = defaultdict(list)
+        for (model, field, pk), amount in updates.items():
+            batches[(model, field, amount)].append(pk)
+
+        with transaction.atomic():
+            for (model, field, amount), pks in batches.items():
+                for i in range(0, len(pks), UPDATE_BATCH_SIZE):
+                    model.objects.filter(pk__in=pks[i:i + UPDATE_BATCH_SIZE]) \
+                        .update(**{field: F(field) + amount})
+
+        counters_flushed.send(sender=self.__class__, updates=updates)
+
+    def _start_flusher(self):
+        # Called with the lock held
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run,
+                                        name='rango-view-counter')
+        self._thread.daemon = True
+        self._thread.start()
+        # Don't lose whatever is still pending when the process exits
+        atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush view counters")
+
+
+view_counter = ViewCounter()
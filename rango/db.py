@@ -0,0 +1,61 @@
+"""
+Database connection tuning and routing.
+
+On each new SQLite connection, the PRAGMAs in settings.RANGO_SQLITE_PRAGMAS
+are run, e.g.
+
+    RANGO_SQLITE_PRAGMAS = {'journal_mode': 'wal', 'synchronous': 'normal'}
+
+ReadWriteRouter sends reads to the database alias named by
+RANGO_READ_DATABASE, a second connection to the same file, and all writes
+to the default database. Connections under the read alias are opened with
+query_only, so a write routed there by mistake fails loudly. With WAL,
+reads on that connection neither wait for nor block the writer.
+
+Inside a transaction on the default database reads stay there too, so
+they see the transaction's own uncommitted writes.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def read_database():
+    return getattr(settings, 'RANGO_READ_DATABASE', None)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'RANGO_SQLITE_PRAGMAS', None) or {})
+    if connection.alias == read_database():
+        pragmas['query_only'] = 1
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in sorted(pragmas.items()):
+            cursor.execute('PRAGMA {0} = {1}'.format(name, value))
+
+
+class ReadWriteRouter(object):
+
+    def db_for_read(self, model, **hints):
+        alias = read_database()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Also for objects that were read from the read alias
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == read_database():
+            return False
+        return None
@@ -1,4 +1,9 @@
+import csv
+import io
+import json
+
 from django import forms
+from django.conf import settings
 from rango.models import Page,Category,UserProfile
 from django.contrib.auth.models import User
 
@@ -36,6 +41,65 @@ class PageForm(forms.ModelForm):
         model = Page
         exclude = ('category',)
 
+def clean_page_rows(rows):
+    """
+    Validate pages given as dicts with title and url, all in one pass.
+    Returns (pages, errors): the cleaned pages, and one message per bad row.
+    URLs without a scheme get http://, as with PageForm. More than
+    RANGO_BULK_PAGES_MAX rows is an error of its own, and none are cleaned.
+    """
+    limit = getattr(settings, 'RANGO_BULK_PAGES_MAX', 1000)
+    if len(rows) > limit:
+        return [], ["At most {0} pages can be added at once.".format(limit)]
+    title_field = forms.CharField(max_length=128)
+    url_field = forms.URLField(max_length=200)
+    pages = []
+    errors = []
+    for number, row in enumerate(rows, 1):
+        try:
+            if not isinstance(row, dict):
+                raise forms.ValidationError("expected a title and a URL")
+            pages.append({'title': title_field.clean(row.get('title')),
+                          'url': url_field.clean(row.get('url'))})
+        except forms.ValidationError as e:
+            errors.append("Page {0}: {1}".format(number, " ".join(e.messages)))
+    return pages, errors
+
+
+class BulkPageForm(forms.Form):
+    pages = forms.CharField(
+        widget=forms.Textarea, required=False,
+        help_text="One page per line: title, URL")
+    upload = forms.FileField(
+        required=False,
+        help_text="Or upload a CSV file with title and url columns, or a "
+                  "JSON list of {\"title\": ..., \"url\": ...} objects.")
+
+    def clean(self):
+        rows = [dict(zip(('title', 'url'), [value.strip() for value in line]))
+                for line in csv.reader(io.StringIO(
+                    self.cleaned_data.get('pages') or ''))
+                if line]
+        upload = self.cleaned_data.get('upload')
+        if upload:
+            try:
+                text = upload.read().decode('utf-8')
+                if upload.name.endswith('.json'):
+                    rows.extend(json.loads(text))
+                else:
+                    rows.extend(csv.DictReader(io.StringIO(text)))
+            except (UnicodeDecodeError, ValueError, csv.Error, TypeError):
+                raise forms.ValidationError("The file couldn't be read.")
+
+        if not rows:
+            raise forms.ValidationError("Enter or upload at least one page.")
+        pages, errors = clean_page_rows(rows)
+        if errors:
+            raise forms.ValidationError(errors)
+        self.cleaned_data['rows'] = pages
+        return self.cleaned_data
+
+
 class UserForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput())
 
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher, with the iteration count taken from
+    settings.RANGO_PASSWORD_ITERATIONS when that is set. Hashes are
+    compatible either way; a password hashed with another count is rehashed
+    on the user's next login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'RANGO_PASSWORD_ITERATIONS', None) or \
+            hashers.PBKDF2PasswordHasher.iterations
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+# Profile pictures are stored under their content hash, so identical
+# uploads share one file and one set of thumbnails:
+#   profile_images/<sha256>.<ext>
+#   profile_images/thumbs/<sha256>_<size>.<webp|jpg>
+UPLOAD_DIR = 'profile_images'
+THUMBNAIL_DIR = 'profile_images/thumbs'
+
+# (file extension, Pillow format); WebP only if Pillow was built with it
+FORMATS = [('webp', 'WEBP'), ('jpg', 'JPEG')] if features.check('webp') \
+    else [('jpg', 'JPEG')]
+
+_executor = None
+_executor_lock = threading.Lock()
+# Pictures waiting for or being processed; None until the pool starts
+_slots = None
+
+
+def thumbnail_sizes():
+    return getattr(settings, 'RANGO_THUMBNAIL_SIZES', (64, 200))
+
+
+def store_upload(upload):
+    """
+    Copy an uploaded file into the media directory chunk by chunk, hashing
+    it on the way. Returns (storage name, sha256 hex digest). If a file with
+    the same content is already stored, the new copy is dropped.
+    """
+    directory = default_storage.path(UPLOAD_DIR)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in upload.chunks():
+                digest.update(chunk)
+                f.write(chunk)
+        ext = os.path.splitext(upload.name)[1].lower() or '.jpg'
+        name = '{0}/{1}{2}'.format(UPLOAD_DIR, digest.hexdigest(), ext)
+        path = default_storage.path(name)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+        else:
+            os.rename(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return name, digest.hexdigest()
+
+
+def make_variants(name, digest):
+    # Write every thumbnail size in every format, skipping ones that exist
+    # already, and return {size: {ext: storage name}}
+    variants = {}
+    image = None
+    for size in thumbnail_sizes():
+        variants[str(size)] = {}
+        for ext, image_format in FORMATS:
+            variant = '{0}/{1}_{2}.{3}'.format(THUMBNAIL_DIR, digest, size, ext)
+            path = default_storage.path(variant)
+            if not os.path.exists(path):
+                if image is None:
+                    image = Image.open(default_storage.path(name))
+                    image.draft('RGB', (max(thumbnail_sizes()),) * 2)
+                    image = image.convert('RGB')
+                thumb = image.copy()
+                thumb.thumbnail((size, size), Image.LANCZOS)
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                thumb.save(path, image_format, quality=85)
+            variants[str(size)][ext] = variant
+    return variants
+
+
+def get_executor():
+    # Thumbnails are made on threads, or with RANGO_IMAGE_POOL = 'process'
+    # in worker processes, which don't share the web workers' CPU time
+    # under the GIL. Either way at most RANGO_IMAGE_QUEUE_SIZE pictures
+    # wait at once.
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'RANGO_IMAGE_WORKERS', 2)
+            if getattr(settings, 'RANGO_IMAGE_POOL', 'thread') == 'process':
+                _executor = ProcessPoolExecutor(max_workers=workers)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=workers)
+            _slots = threading.BoundedSemaphore(
+                getattr(settings, 'RANGO_IMAGE_QUEUE_SIZE', 100))
+        return _executor
+
+
+def process_picture(profile):
+    """
+    Generate the thumbnails for a profile's picture and record them on the
+    profile. Runs on the worker pool, or straight away when
+    RANGO_IMAGE_WORKERS is 0. When the pool's queue is full the picture is
+    left for the make_thumbnails command, and the original is shown until
+    then. Returns False in that case.
+    """
+    from rango.models import UserProfile
+
+    # The same picture may already have been processed for someone else
+    done = UserProfile.objects.filter(picture_sha256=profile.picture_sha256) \
+        .exclude(picture_variants='') \
+        .values_list('picture_variants', flat=True).first()
+    if done:
+        UserProfile.objects.filter(pk=profile.pk).update(picture_variants=done)
+        return True
+
+    args = (profile.pk, profile.picture.name, profile.picture_sha256)
+    if getattr(settings, 'RANGO_IMAGE_WORKERS', 2) <= 0:
+        record_variants(profile.pk, make_variants(*args[1:]))
+        return True
+
+    executor = get_executor()
+    if not _slots.acquire(blocking=False):
+        logger.warning("Thumbnail queue full; not processing %s", args[1])
+        return False
+    # Only the image work runs in the pool; the result is recorded here,
+    # so worker processes never touch the database
+    future = executor.submit(make_variants, *args[1:])
+    submitter = threading.current_thread()
+    future.add_done_callback(
+        lambda future: _variants_done(args, future, submitter))
+    return True
+
+
+def record_variants(pk, variants):
+    from rango.models import UserProfile
+    UserProfile.objects.filter(pk=pk).update(
+        picture_variants=json.dumps(variants))
+
+
+def _variants_done(args, future, submitter):
+    # Called on a pool thread (or the process pool's management thread),
+    # or by submit() itself if the work was already done
+    try:
+        record_variants(args[0], future.result())
+    except Exception:
+        logger.exception("Failed to make thumbnails for %s", args[1])
+    finally:
+        _slots.release()
+        # Pool threads get their own database connection; don't leak it
+        if threading.current_thread() is not submitter:
+            connection.close()
@@ -0,0 +1,238 @@
+"""
+Per-view request instrumentation.
+
+InstrumentationMiddleware times every request and records, under the name
+of the URL pattern that handled it: wall time, number and total time of
+database queries, time spent rendering templates, and whether the session
+was modified. The last RANGO_STATS_SAMPLES requests of each view are kept
+in a ring buffer, from which percentiles are computed on demand.
+
+Query timing needs the database cursor wrapped (done by the middleware on
+first use of each connection) and template timing needs the instrumented
+template backend in settings.TEMPLATES:
+
+    'BACKEND': 'rango.instrumentation.DjangoTemplates'
+
+Every RANGO_STATS_PUBLISH_INTERVAL seconds each process copies its samples
+to the cache, so the staff-only view and the dump_view_stats command can
+report on all processes sharing that cache.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.utils import CursorDebugWrapper, CursorWrapper
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from rango.stats import percentile
+
+PROCESSES_KEY = 'rango:view_stats:processes'
+SAMPLES_KEY = 'rango:view_stats:{0}'
+
+# Order of the values in each sample
+METRICS = ('wall', 'queries', 'query_time', 'template_time', 'session_modified')
+
+_local = threading.local()
+
+
+class RequestStats(object):
+    __slots__ = ('queries', 'query_time', 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+class TimedCursorMixin(object):
+
+    def execute(self, sql, params=None):
+        stats = current_stats()
+        if stats is None:
+            return super(TimedCursorMixin, self).execute(sql, params)
+        start = time.perf_counter()
+        try:
+            return super(TimedCursorMixin, self).execute(sql, params)
+        finally:
+            stats.queries += 1
+            stats.query_time += time.perf_counter() - start
+
+    def executemany(self, sql, param_list):
+        stats = current_stats()
+        if stats is None:
+            return super(TimedCursorMixin, self).executemany(sql, param_list)
+        start = time.perf_counter()
+        try:
+            return super(TimedCursorMixin, self).executemany(sql, param_list)
+        finally:
+            stats.queries += 1
+            stats.query_time += time.perf_counter() - start
+
+
+class TimedCursorWrapper(TimedCursorMixin, CursorWrapper):
+    pass
+
+
+class TimedCursorDebugWrapper(TimedCursorMixin, CursorDebugWrapper):
+    pass
+
+
+def instrument_connections():
+    for connection in connections.all():
+        if not getattr(connection, 'rango_instrumented', False):
+            connection.make_cursor = \
+                lambda cursor, db=connection: TimedCursorWrapper(cursor, db)
+            connection.make_debug_cursor = \
+                lambda cursor, db=connection: TimedCursorDebugWrapper(cursor, db)
+            connection.rango_instrumented = True
+
+
+class TimedTemplate(object):
+    # Wraps a backend template to add its render time to the request stats.
+    # Only top-level renders go through here, so nested templates
+    # ({% include %}, inclusion tags) are not counted twice.
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = current_stats()
+        if stats is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+
+    def from_string(self, template_code):
+        return TimedTemplate(
+            super(DjangoTemplates, self).from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super(DjangoTemplates, self).get_template(template_name))
+
+
+class StatsRegistry(object):
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+        self._last_published = time.time()
+
+    @property
+    def size(self):
+        return getattr(settings, 'RANGO_STATS_SAMPLES', 1000)
+
+    def record(self, view_name, sample):
+        buffer = self.samples.get(view_name)
+        if buffer is None:
+            with self._lock:
+                buffer = self.samples.setdefault(view_name,
+                                                 deque(maxlen=self.size))
+        # deque.append is atomic, and maxlen keeps memory bounded
+        buffer.append(sample)
+
+    def snapshot(self):
+        with self._lock:
+            views = list(self.samples.items())
+        return dict((name, list(buffer)) for name, buffer in views)
+
+    def maybe_publish(self):
+        interval = getattr(settings, 'RANGO_STATS_PUBLISH_INTERVAL', 10)
+        now = time.time()
+        if now - self._last_published < interval:
+            return
+        self._last_published = now
+        self.publish(interval)
+
+    def publish(self, interval=10):
+        # Samples expire if the process stops publishing them
+        timeout = interval * 6
+        pid = os.getpid()
+        cache.set(SAMPLES_KEY.format(pid), self.snapshot(), timeout)
+        processes = cache.get(PROCESSES_KEY) or []
+        if pid not in processes:
+            cache.set(PROCESSES_KEY, processes[-63:] + [pid], None)
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}
+
+
+registry = StatsRegistry()
+
+
+def collect():
+    # Samples from this process plus those other processes have published
+    merged = registry.snapshot()
+    for pid in cache.get(PROCESSES_KEY) or []:
+        if pid == os.getpid():
+            continue
+        for name, samples in (cache.get(SAMPLES_KEY.format(pid)) or {}).items():
+            merged.setdefault(name, []).extend(samples)
+    return merged
+
+
+def summarize(samples_by_view=None):
+    """
+    {view name: {'requests': n, 'sessions_modified': n,
+                 'wall': {'p50': .., 'p95': .., 'p99': .., 'max': ..}, ...}}
+    Times are in milliseconds.
+    """
+    if samples_by_view is None:
+        samples_by_view = collect()
+    summary = {}
+    for name, samples in samples_by_view.items():
+        if not samples:
+            continue
+        view = {'requests': len(samples),
+                'sessions_modified': sum(1 for s in samples if s[4])}
+        for index, metric in enumerate(METRICS[:4]):
+            values = sorted(s[index] for s in samples)
+            scale = 1 if metric == 'queries' else 1000.0
+            view[metric] = dict(
+                [('p{0}'.format(pct), percentile(values, pct) * scale)
+                 for pct in (50, 95, 99)] + [('max', values[-1] * scale)])
+        summary[name] = view
+    return summary
+
+
+class InstrumentationMiddleware(object):
+    # Goes first in MIDDLEWARE so the time covers the whole request
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        instrument_connections()
+        stats = _local.stats = RequestStats()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.stats = None
+        wall = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        session = getattr(request, 'session', None)
+        registry.record(
+            match.view_name if match else '<unresolved>',
+            (wall, stats.queries, stats.query_time, stats.template_time,
+             bool(session is not None and session.modified)))
+        registry.maybe_publish()
+        return response
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.cache import cache
+from rango.models import Category, Page
+
+# Boards are kept up to date incrementally, this only bounds how long a
+# board can be wrong if two processes race on an update
+BOARD_TIMEOUT = 60 * 5
+
+
+class Leaderboard(object):
+    """
+    Top-N objects of a model by a counter field, kept in the cache as a
+    list of plain dicts. Reading the board is a single cache lookup; it is
+    patched when objects are saved, and only rebuilt (one indexed query)
+    when a patch can't tell what the new top-N is.
+    """
+
+    def __init__(self, name, model, field, fields):
+        self.key = 'rango:leaderboard:{0}'.format(name)
+        self.model = model
+        self.field = field
+        self.fields = ('id', field) + tuple(fields)
+
+    @property
+    def size(self):
+        return getattr(settings, 'RANGO_LEADERBOARD_SIZE', 5)
+
+    def top(self):
+        board = cache.get(self.key)
+        if board is None:
+            board = self.rebuild()
+        return board
+
+    def rebuild(self):
+        board = list(self.model.objects.order_by('-' + self.field, 'id')
+                     .values(*self.fields)[:self.size])
+        cache.set(self.key, board, BOARD_TIMEOUT)
+        return board
+
+    def clear(self):
+        cache.delete(self.key)
+
+    def update(self, obj):
+        board = cache.get(self.key)
+        if board is None:
+            # Nothing cached; the next read rebuilds it
+            return
+
+        others = [entry for entry in board if entry['id'] != obj.pk]
+        was_listed = len(others) < len(board)
+        # A board shorter than N holds every object there is
+        complete = len(board) < self.size
+        entry = dict((f, getattr(obj, f)) for f in self.fields)
+
+        if not complete and not was_listed and \
+                self._sort_key(entry) > self._sort_key(board[-1]):
+            # Still outside the top N
+            return
+
+        board = sorted(others + [entry], key=self._sort_key)
+        if not complete and was_listed and board[-1] is entry:
+            # Moved to the bottom; an object outside the board might now
+            # outrank it, so let the next read rebuild from the database
+            self.clear()
+            return
+        cache.set(self.key, board[:self.size], BOARD_TIMEOUT)
+
+    def remove(self, pk):
+        board = cache.get(self.key)
+        if board is not None and any(entry['id'] == pk for entry in board):
+            self.clear()
+
+    def _sort_key(self, entry):
+        return (-entry[self.field], entry['id'])
+
+
+category_leaderboard = Leaderboard('categories', Category, 'likes',
+                                   ('name', 'slug'))
+page_leaderboard = Leaderboard('pages', Page, 'views', ('title', 'url'))
+
+LEADERBOARDS = (category_leaderboard, page_leaderboard)
@@ -0,0 +1,173 @@
+"""
+Checking that pages' URLs still work.
+
+check_links() takes (page id, URL) pairs and checks them on a pool of
+threads, yielding (page id, status) as each answer comes back. The status
+is the HTTP status of the response (after redirects), or UNREACHABLE if
+there was none: DNS failure, refused connection, timeout or a bad URL.
+
+Hosts are checked politely: one request at a time per host, and no more
+than `rate` requests a second to it. URLs for a host that is busy wait in
+a queue of their own rather than holding a thread, so one big site never
+stalls the checks of the others. At most `backlog` URLs wait at a time,
+so a long stream of pages is read only as fast as it is checked.
+
+save_results() writes statuses back in one UPDATE per status and batch,
+and pages_due() lists the pages to check: all of them, or those never
+checked or last checked longer ago than a given age. The check_links
+command puts the three together.
+"""
+import http.client
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.db.models import Q
+from django.utils import timezone
+from rango.models import Page
+
+UNREACHABLE = 0
+
+USER_AGENT = 'Rango link checker'
+
+SAVE_BATCH_SIZE = 500
+
+
+def host_of(url):
+    try:
+        return (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+def is_broken(status):
+    return status is not None and (status == UNREACHABLE or status >= 400)
+
+
+def check_url(url, timeout=10):
+    # HEAD first; GET for servers that don't allow HEAD. The body of a
+    # GET is never read.
+    for method in ('HEAD', 'GET'):
+        request = Request(url, method=method,
+                          headers={'User-Agent': USER_AGENT})
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                status = response.status
+        except HTTPError as e:
+            status = e.code
+        except (URLError, http.client.HTTPException, OSError, ValueError):
+            return UNREACHABLE
+        if method == 'HEAD' and status in (405, 501):
+            continue
+        return status
+
+
+class HostLimiter(object):
+    """
+    Spaces requests to each host at least 1/rate seconds apart. wait(host)
+    sleeps until the host's next free slot and takes it. A rate of 0 means
+    no limit.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def check_links(rows, workers=16, rate=1.0, timeout=10, backlog=None):
+    limiter = HostLimiter(rate)
+    backlog = backlog or workers * 50
+    rows = iter(rows)
+    running = {}                 # future -> (page id, host)
+    busy = set()                 # hosts with a request running
+    waiting = defaultdict(deque) # busy host -> [(page id, url), ...]
+    queued = 0
+    more = True
+
+    def check(host, url):
+        limiter.wait(host)
+        return check_url(url, timeout)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(page_id, url, host):
+            running[executor.submit(check, host, url)] = (page_id, host)
+            busy.add(host)
+
+        while True:
+            while more and len(running) < workers and queued < backlog:
+                try:
+                    page_id, url = next(rows)
+                except StopIteration:
+                    more = False
+                    break
+                host = host_of(url)
+                if host in busy:
+                    waiting[host].append((page_id, url))
+                    queued += 1
+                else:
+                    submit(page_id, url, host)
+            # Every waiting URL's host is busy, so nothing running means
+            # nothing is left
+            if not running:
+                return
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_id, host = running.pop(future)
+                busy.discard(host)
+                if waiting[host]:
+                    queued -= 1
+                    submit(*waiting[host].popleft(), host=host)
+                if not waiting[host]:
+                    del waiting[host]
+                yield page_id, future.result()
+
+
+def pages_due(max_age=None):
+    # Every page, or with max_age (a timedelta) the pages never checked or
+    # checked longer ago than that
+    pages = Page.objects.order_by('id')
+    if max_age is None:
+        return pages
+    return pages.filter(Q(last_checked__isnull=True) |
+                        Q(last_checked__lt=timezone.now() - max_age))
+
+
+def save_results(results, batch_size=SAVE_BATCH_SIZE):
+    # Write (page id, status) pairs as they come, a batch at a time, and
+    # return a Counter of the statuses
+    counts = Counter()
+    batch = []
+
+    def save():
+        by_status = defaultdict(list)
+        for page_id, status in batch:
+            by_status[status].append(page_id)
+        now = timezone.now()
+        for status, ids in by_status.items():
+            Page.objects.filter(pk__in=ids).update(link_status=status,
+                                                   last_checked=now)
+        del batch[:]
+
+    for page_id, status in results:
+        counts[status] += 1
+        batch.append((page_id, status))
+        if len(batch) >= batch_size:
+            save()
+    if batch:
+        save()
+    return counts
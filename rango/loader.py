@@ -0,0 +1,314 @@
+import csv
+import gzip
+import io
+import json
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rango import search
+from rango.caching import (bump_category_version, bump_counters_version,
+                           bump_pages_version)
+from rango.leaderboard import category_leaderboard, page_leaderboard
+from rango.models import Category, Page, unique_slugs
+from rango.services import refresh_page_stats
+
+# Bulk, idempotent loading of categories and pages. Rows are plain dicts:
+#   categories: name, views, likes
+#   pages:      category (the category name), title, url, views
+# Categories are matched on name and pages on (category, title); existing
+# rows are updated only when something changed, so loading the same file
+# twice writes nothing the second time. dump_categories() and dump_pages()
+# write files in the same formats, so a dump loads straight back.
+
+# Stay under SQLite's limit of 999 parameters per query for IN (...) lookups
+LOOKUP_BATCH_SIZE = 450
+
+# Rows read per query when dumping
+DUMP_BATCH_SIZE = 5000
+
+CATEGORY_COLUMNS = ('name', 'views', 'likes')
+PAGE_COLUMNS = ('category', 'title', 'url', 'views')
+
+
+def read_rows(path):
+    # Rows from a .csv or .jsonl file, optionally gzip compressed
+    name = path[:-3] if path.endswith('.gz') else path
+    opener = gzip.open if path.endswith('.gz') else io.open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if name.endswith('.csv'):
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def write_rows(path, columns, rows):
+    # Write tuples of values for columns to a .csv or .jsonl file, gzip
+    # compressed if the name ends in .gz, and return how many there were
+    name = path[:-3] if path.endswith('.gz') else path
+    opener = gzip.open if path.endswith('.gz') else io.open
+    count = 0
+    with opener(path, 'wt', encoding='utf-8', newline='') as f:
+        if name.endswith('.csv'):
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row))) + '\n')
+                count += 1
+    return count
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _int(value):
+    return int(value or 0)
+
+
+def _slices(values, size=LOOKUP_BATCH_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _new_counts():
+    return {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+
+
+def load_categories(rows, chunk_size=5000):
+    counts = _new_counts()
+    for chunk in chunks(rows, chunk_size):
+        # Last row wins if a name appears twice in a chunk
+        wanted = {}
+        for row in chunk:
+            wanted[row['name']] = (_int(row.get('views')), _int(row.get('likes')))
+
+        with transaction.atomic():
+            existing = {}
+            for names in _slices(wanted):
+                for pk, name, views, likes in Category.objects.filter(
+                        name__in=names).values_list('id', 'name', 'views', 'likes'):
+                    existing[name] = (pk, (views, likes))
+
+            new = []
+            for name, (views, likes) in wanted.items():
+                if name not in existing:
+                    new.append(Category(name=name, views=views, likes=likes))
+                elif existing[name][1] != (views, likes):
+                    Category.objects.filter(pk=existing[name][0]).update(
+                        views=views, likes=likes)
+                    counts['updated'] += 1
+                else:
+                    counts['unchanged'] += 1
+            # bulk_create skips Category.save, so make the slugs here; names
+            # that slugify alike get -2, -3, ... as save() would give them
+            for category, slug in zip(new, unique_slugs([c.name for c in new])):
+                category.slug = slug
+            Category.objects.bulk_create(new)
+            counts['created'] += len(new)
+
+    _bulk_write_done()
+    return counts
+
+
+def load_pages(rows, chunk_size=5000):
+    counts = _new_counts()
+    category_ids = {}
+    # Categories that gained pages, whose page counts need refreshing
+    touched = set()
+
+    for chunk in chunks(rows, chunk_size):
+        missing = set(row['category'] for row in chunk) - set(category_ids)
+        for names in _slices(missing):
+            category_ids.update(Category.objects.filter(name__in=names)
+                                .values_list('name', 'id'))
+
+        wanted = {}
+        for row in chunk:
+            category_id = category_ids.get(row['category'])
+            if category_id is None:
+                counts['skipped'] += 1
+                continue
+            wanted[(category_id, row['title'])] = (row['url'],
+                                                   _int(row.get('views')))
+
+        with transaction.atomic():
+            existing = _find_pages(wanted)
+            new = []
+            changed = []
+            for key, (url, views) in wanted.items():
+                if key not in existing:
+                    new.append(Page(category_id=key[0], title=key[1],
+                                    url=url, views=views))
+                elif existing[key][1:] != (url, views):
+                    Page.objects.filter(pk=existing[key][0]).update(
+                        url=url, views=views)
+                    changed.append((existing[key][0], key[1], url))
+                    counts['updated'] += 1
+                else:
+                    counts['unchanged'] += 1
+            Page.objects.bulk_create(new)
+            counts['created'] += len(new)
+            touched.update(page.category_id for page in new)
+
+            # bulk_create doesn't return ids on SQLite, so look the new
+            # pages up again to add them to the search index
+            created = _find_pages([(p.category_id, p.title) for p in new])
+            changed.extend((pk, key[1], url)
+                           for key, (pk, url, views) in created.items())
+            search.index_pages(changed)
+
+    # bulk_create bypasses Page.save(), which keeps the counts
+    refresh_page_stats(touched)
+    _bulk_write_done()
+    return counts
+
+
+def add_pages(category, rows):
+    """
+    Add pages (dicts with title and url) to one category in one transaction.
+    Rows whose URL the category already has, or that repeat an earlier
+    row's URL, are skipped. Returns (created, skipped) lists of rows.
+    """
+    created = []
+    skipped = []
+    with transaction.atomic():
+        # One probe of the (category, url) index per batch of URLs
+        seen = set()
+        for urls in _slices(set(row['url'] for row in rows)):
+            seen.update(Page.objects.filter(category=category, url__in=urls)
+                        .values_list('url', flat=True))
+        for row in rows:
+            if row['url'] in seen:
+                skipped.append(row)
+            else:
+                seen.add(row['url'])
+                created.append(row)
+
+        now = timezone.now()
+        Page.objects.bulk_create(
+            [Page(category=category, title=row['title'], url=row['url'],
+                  added=now)
+             for row in created])
+        # bulk_create doesn't return ids on SQLite, so look the new pages
+        # up again to add them to the search index
+        new_urls = set(row['url'] for row in created)
+        for urls in _slices(new_urls):
+            search.index_pages(list(
+                Page.objects.filter(category=category, url__in=urls)
+                .values_list('id', 'title', 'url')))
+        # Counted as Page.save() does, rather than recounting the category
+        if created:
+            Category.objects.filter(pk=category.pk).update(
+                page_count=F('page_count') + len(created),
+                last_page_added=now)
+
+    _bulk_write_done()
+    return created, skipped
+
+
+def batched_rows(queryset, fields, batch_size=DUMP_BATCH_SIZE):
+    """
+    values_list() rows of queryset, id first, in id order. Each batch is
+    its own query starting after the last id seen: SQLite's driver reads
+    a whole result into memory even with .iterator(), so this is what keeps
+    memory use the same however big the table is.
+    """
+    last_id = None
+    while True:
+        batch = queryset.order_by('id')
+        if last_id is not None:
+            batch = batch.filter(id__gt=last_id)
+        count = 0
+        for row in batch.values_list('id', *fields)[:batch_size].iterator():
+            count += 1
+            last_id = row[0]
+            yield row
+        if count < batch_size:
+            return
+
+
+def dump_categories(path, since_id=None, since=None, batch_size=DUMP_BATCH_SIZE):
+    """
+    Write categories to path in the format load_categories() reads: those
+    with an id above since_id, and with since (a datetime) only those that
+    have had pages added since then. Returns (rows written, last id).
+    """
+    categories = Category.objects.all()
+    if since_id is not None:
+        categories = categories.filter(id__gt=since_id)
+    if since is not None:
+        categories = categories.filter(last_page_added__gte=since)
+    return _dump(path, CATEGORY_COLUMNS,
+                 batched_rows(categories, CATEGORY_COLUMNS, batch_size))
+
+
+def dump_pages(path, since_id=None, since=None, batch_size=DUMP_BATCH_SIZE):
+    """
+    Write pages to path in the format load_pages() reads: those with an id
+    above since_id, and with since (a datetime) only those added since then.
+    Returns (rows written, last id).
+    """
+    pages = Page.objects.all()
+    if since_id is not None:
+        pages = pages.filter(id__gt=since_id)
+    if since is not None:
+        pages = pages.filter(added__gte=since)
+    return _dump(path, PAGE_COLUMNS,
+                 batched_rows(pages, ('category__name', 'title', 'url', 'views'),
+                              batch_size))
+
+
+def _dump(path, columns, rows):
+    last = [None]
+
+    def values():
+        for row in rows:
+            last[0] = row[0]
+            yield row[1:]
+
+    return write_rows(path, columns, values()), last[0]
+
+
+def _find_pages(keys):
+    # Map (category_id, title) keys to (id, url, views) of existing pages.
+    # Joining against a VALUES list probes the (category, title) index once
+    # per key; CROSS JOIN makes SQLite keep the key list as the outer loop.
+    found = {}
+    for batch in _slices(keys):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "WITH wanted (category_id, title) AS (VALUES {0}) "
+                "SELECT p.id, p.category_id, p.title, p.url, p.views "
+                "FROM wanted CROSS JOIN {1} p "
+                "ON p.category_id = wanted.category_id "
+                "AND p.title = wanted.title".format(
+                    ', '.join(['(%s, %s)'] * len(batch)),
+                    Page._meta.db_table),
+                [value for key in batch for value in key])
+            for pk, category_id, title, url, views in cursor.fetchall():
+                found[(category_id, title)] = (pk, url, views)
+    return found
+
+
+def _bulk_write_done():
+    # Bulk writes don't send model signals, so invalidate what they would
+    bump_category_version()
+    bump_pages_version()
+    bump_counters_version()
+    category_leaderboard.clear()
+    page_leaderboard.clear()
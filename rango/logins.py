@@ -0,0 +1,226 @@
+"""
+The checks user_login makes before (and instead of) authenticate().
+
+Rate limits: each login attempt takes a token from a bucket for the client
+IP and one for the username, kept in the cache. Buckets hold `burst` tokens
+and refill at `per_minute`; an attempt finding either empty is refused at
+once, without hashing anything. A successful login gives its tokens back,
+so only failed attempts count against the limits.
+
+Unknown usernames: each process keeps a Bloom filter of every username.
+When USERS_ADDED_KEY changes (rango.signals bumps it when a user is added)
+the users with a higher id than the last it has are added to it; when
+USERNAMES_VERSION_KEY changes (a user renamed or deleted) it is rebuilt. A
+username the filter has never seen can't
+exist, so it is refused without a database query or a password hash. The
+response is delayed by as long as hashing a password takes, so it can't be
+told from a wrong password by its timing, but the delay is a sleep: it
+costs the worker no CPU. Usernames the filter might know (about 1% of
+unknown ones, by false positive) go through authenticate() as usual.
+
+Buckets are read and written without a lock, so attempts arriving at the
+same moment can occasionally share a token. The limits are approximate,
+not exact.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rango.caching import bump_version, get_version
+
+USERNAMES_VERSION_KEY = 'rango:usernames_version'
+USERS_ADDED_KEY = 'rango:users_added'
+
+BUCKET_KEY = 'rango:login_bucket:{0}:{1}'
+
+# Bloom filter false positive rate, and the fewest users it is sized for
+FALSE_POSITIVE_RATE = 0.01
+MIN_CAPACITY = 1000
+
+
+class TokenBucket(object):
+
+    def __init__(self, name, burst, per_minute):
+        self.name = name
+        self.burst = burst
+        self.rate = per_minute / 60.0
+
+    def key(self, value):
+        digest = hashlib.md5(value.encode('utf-8')).hexdigest()
+        return BUCKET_KEY.format(self.name, digest)
+
+    def take(self, value, tokens=1):
+        """
+        Take tokens from value's bucket. Returns 0 if there were enough,
+        otherwise the seconds until there will be (nothing is taken).
+        """
+        key = self.key(value)
+        now = time.time()
+        level, stamp = cache.get(key) or (self.burst, now)
+        level = min(self.burst, level + (now - stamp) * self.rate)
+        if level < tokens:
+            return (tokens - level) / self.rate
+        # Once it has had time to refill, a missing bucket is a full one
+        timeout = int(self.burst / self.rate) + 1
+        cache.set(key, (level - tokens, now), timeout)
+        return 0
+
+    def give_back(self, value, tokens=1):
+        self.take(value, -tokens)
+
+
+def ip_bucket():
+    return TokenBucket('ip', getattr(settings, 'RANGO_LOGIN_IP_BURST', 20),
+                       getattr(settings, 'RANGO_LOGIN_IP_PER_MINUTE', 10))
+
+
+def username_bucket():
+    return TokenBucket('username',
+                       getattr(settings, 'RANGO_LOGIN_USERNAME_BURST', 5),
+                       getattr(settings, 'RANGO_LOGIN_USERNAME_PER_MINUTE', 2))
+
+
+class BloomFilter(object):
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.count = 0
+        self.size = max(8, int(-capacity * math.log(error_rate) /
+                               math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, value):
+        # k positions from two halves of one digest (double hashing)
+        digest = hashlib.md5(value.encode('utf-8')).digest()
+        a = int.from_bytes(digest[:8], 'little')
+        b = int.from_bytes(digest[8:], 'little') | 1
+        return [(a + i * b) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        self.count += 1
+        for position in self.positions(value):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, value):
+        return all(self.bits[position // 8] & (1 << (position % 8))
+                   for position in self.positions(value))
+
+
+class KnownUsernames(object):
+    """
+    The per-process Bloom filter of usernames. New users are added to it
+    when the added counter in the cache moves on; it is rebuilt from the
+    database when the version does, or when it has filled up.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.added = None
+        self.filter = None
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, username):
+        version = get_version(USERNAMES_VERSION_KEY)
+        added = get_version(USERS_ADDED_KEY)
+        if (version, added) != (self.version, self.added):
+            with self.lock:
+                if version != self.version or \
+                        self.filter.count >= self.filter.capacity:
+                    self.filter = self.build()
+                    self.version = version
+                    self.added = added
+                elif added != self.added:
+                    self.add_new(self.filter)
+                    self.added = added
+        return username in self.filter
+
+    def build(self):
+        self.last_id = 0
+        bloom = BloomFilter(max(MIN_CAPACITY, User.objects.count() * 2))
+        self.add_new(bloom)
+        return bloom
+
+    def add_new(self, bloom):
+        # Users with a higher id than any seen so far, in one range scan
+        # of the primary key
+        for pk, username in User.objects.filter(pk__gt=self.last_id) \
+                .order_by('pk').values_list('pk', 'username').iterator():
+            bloom.add(username)
+            self.last_id = pk
+
+
+known_usernames = KnownUsernames()
+
+
+def users_added():
+    bump_version(USERS_ADDED_KEY)
+
+
+def usernames_changed():
+    bump_version(USERNAMES_VERSION_KEY)
+
+
+_hash_times = {}
+
+
+def hash_time():
+    # How long checking a password takes with the current hasher: the
+    # median of a few runs, measured once per process (and iteration count)
+    hasher = get_hasher()
+    key = (hasher.algorithm, getattr(hasher, 'iterations', None))
+    if key not in _hash_times:
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            hasher.encode('rango-timing', hasher.salt())
+            timings.append(time.perf_counter() - start)
+        _hash_times[key] = sorted(timings)[2]
+    return _hash_times[key]
+
+
+def client_ip(request):
+    # Only the direct peer: X-Forwarded-For can be set by anyone unless a
+    # trusted proxy overwrites it
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class LoginRefused(Exception):
+    pass
+
+
+def check_login(request, username, password):
+    """
+    authenticate(), behind the rate limits and the unknown username check.
+    Returns the user, or None for wrong details. Raises LoginRefused, with
+    the seconds to wait as its argument, when a limit has been reached.
+    """
+    start = time.perf_counter()
+    username = username or ''
+    ip = client_ip(request)
+    ips, usernames = ip_bucket(), username_bucket()
+    wait = ips.take(ip)
+    if wait:
+        raise LoginRefused(wait)
+    wait = usernames.take(username)
+    if wait:
+        ips.give_back(ip)
+        raise LoginRefused(wait)
+
+    if username not in known_usernames:
+        # As long as a wrong password for a real user would take
+        time.sleep(max(0, hash_time() - (time.perf_counter() - start)))
+        return None
+
+    user = authenticate(username=username, password=password)
+    if user is not None:
+        ips.give_back(ip)
+        usernames.give_back(username)
+    return user
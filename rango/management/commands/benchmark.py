@@ -0,0 +1,201 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, modify_settings,
+                               override_settings)
+from rango import instrumentation
+from rango.bench import (SIZES, compare, format_stats, measure, percentile,
+                         scratch_database, seed_catalogue)
+from rango.counters import view_counter
+
+MIDDLEWARE = 'rango.instrumentation.InstrumentationMiddleware'
+
+
+class Command(BaseCommand):
+    help = ("Benchmark every Rango view against a synthetic dataset and "
+            "optionally compare with a stored baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(SIZES), default='1k')
+        parser.add_argument('--requests', type=int, default=200,
+                            help="requests per scenario")
+        parser.add_argument('--scenario', action='append',
+                            help="run only these scenarios")
+        parser.add_argument('--baseline', help="baseline JSON file")
+        parser.add_argument('--write-baseline', action='store_true',
+                            help="save the results as the new baseline")
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help="allowed p50 slowdown before failing")
+
+    def handle(self, *args, **options):
+        scenarios = [(name, method) for name, method in self.scenarios()
+                     if not options['scenario'] or name in options['scenario']]
+
+        # The view scenarios read their numbers from the instrumentation
+        # middleware, so make sure it's installed. DEBUG is off so queries
+        # aren't logged, as in production.
+        with scratch_database(), \
+                modify_settings(MIDDLEWARE={'prepend': MIDDLEWARE}), \
+                override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            pages = SIZES[options['size']]
+            self.stdout.write("Seeding {0} pages...".format(pages))
+            start = time.time()
+            seed_catalogue(pages)
+            self.stdout.write("Seeded in {0:.1f}s".format(time.time() - start))
+            self.setup()
+
+            results = {}
+            for name, method in scenarios:
+                results[name] = method(options['requests'])
+                view_counter.flush()
+                self.stdout.write("{0}  {1:8.0f} req/s  {2:5} queries".format(
+                    format_stats(name, results[name]),
+                    results[name]['throughput'], results[name]['queries']))
+
+        if options['baseline']:
+            self.check_baseline(results, options)
+
+    def check_baseline(self, results, options):
+        path = options['baseline']
+        if options['write_baseline']:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write("Wrote baseline to {0}".format(path))
+            return
+
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+        except (IOError, ValueError) as e:
+            raise CommandError("Can't read baseline {0}: {1}".format(path, e))
+        regressions = compare(results, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError("Regressions against {0}:\n  {1}".format(
+                path, "\n  ".join(regressions)))
+        self.stdout.write("No regressions against {0}".format(path))
+
+    def scenarios(self):
+        return [
+            ('index', self.bench_index),
+            ('index_uncached', self.bench_index_uncached),
+            ('show_category', self.bench_show_category),
+            ('show_category_uncached', self.bench_show_category_uncached),
+            ('add_page', self.bench_add_page),
+            ('add_pages', self.bench_add_pages),
+            ('user_login', self.bench_user_login),
+            ('register', self.bench_register),
+            ('like_category', self.bench_like_category),
+            ('sidebar_tag', self.bench_sidebar_tag),
+        ]
+
+    def setup(self):
+        cache.clear()
+        User.objects.create_user('bench', password='bench-password')
+        self.client = Client()
+        self.user_client = Client()
+        self.user_client.login(username='bench', password='bench-password')
+
+    def run_view(self, view_name, requests, send):
+        # Warm up once (session, caches), then time the rest
+        send(0)
+        instrumentation.registry.reset()
+        start = time.perf_counter()
+        for i in range(1, requests + 1):
+            send(i)
+        elapsed = time.perf_counter() - start
+
+        samples = instrumentation.registry.snapshot().get(view_name, [])
+        if not samples:
+            raise CommandError("No requests were recorded for {0}".format(
+                view_name))
+        wall = sorted(sample[0] for sample in samples)
+        queries = sorted(sample[1] for sample in samples)
+        return {'runs': len(samples),
+                'mean': sum(wall) / len(wall),
+                'p50': percentile(wall, 50),
+                'p99': percentile(wall, 99),
+                'queries': percentile(queries, 50),
+                'throughput': requests / elapsed}
+
+    # The anonymous client's requests are mostly served by the response
+    # cache (rango.middleware); a signed-in user's always run the view
+
+    def bench_index(self, requests):
+        return self.run_view('index', requests,
+                             lambda i: self.client.get('/rango/'))
+
+    def bench_index_uncached(self, requests):
+        return self.run_view('index', requests,
+                             lambda i: self.user_client.get('/rango/'))
+
+    def bench_show_category(self, requests):
+        return self.run_view(
+            'show_category', requests,
+            lambda i: self.client.get('/rango/category/category-0/'))
+
+    def bench_show_category_uncached(self, requests):
+        return self.run_view(
+            'show_category', requests,
+            lambda i: self.user_client.get('/rango/category/category-0/'))
+
+    def bench_add_page(self, requests):
+        return self.run_view(
+            'add_page', requests,
+            lambda i: self.user_client.post(
+                '/rango/category/category-0/add_page/',
+                {'title': "Benchmark page {0}".format(i),
+                 'url': "http://example.com/bench/{0}/".format(i),
+                 'views': 0}))
+
+    def bench_add_pages(self, requests):
+        # 100 pages per request
+        return self.run_view(
+            'add_pages', requests,
+            lambda i: self.user_client.post(
+                '/rango/category/category-1/add_pages/',
+                {'pages': "\n".join(
+                    "Bulk page {0}-{1}, http://example.com/bulk/{0}/{1}/".format(i, j)
+                    for j in range(100))}))
+
+    def bench_user_login(self, requests):
+        return self.run_view(
+            'login', requests,
+            lambda i: Client().post('/rango/login/',
+                                    {'username': 'bench',
+                                     'password': 'bench-password'}))
+
+    def bench_register(self, requests):
+        return self.run_view(
+            'register', requests,
+            lambda i: Client().post('/rango/register/', {
+                'username': 'bench{0}'.format(i), 'email': '',
+                'password': 'bench-password', 'website': ''}))
+
+    def bench_like_category(self, requests):
+        # Every request a new anonymous visitor liking the same category
+        return self.run_view(
+            'like_category', requests,
+            lambda i: Client().post('/rango/category/category-0/like/',
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest'))
+
+    def bench_sidebar_tag(self, requests):
+        template = Template("{% load rango_template_tags %}"
+                            "{% get_category_list %}")
+
+        def render():
+            template.render(Context({}))
+
+        render()
+        with CaptureQueriesContext(connection) as queries:
+            render()
+        start = time.perf_counter()
+        stats = measure(render, requests)
+        stats['throughput'] = requests / (time.perf_counter() - start)
+        stats['queries'] = len(queries)
+        return stats
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rango.bench import format_stats, measure, scratch_database, seed_catalogue
+from rango.leaderboard import page_leaderboard
+from rango.models import Page
+
+
+class Command(BaseCommand):
+    help = ("Compare a full scan, the indexed query and the cached "
+            "leaderboard for the index page's top pages.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1000000)
+        parser.add_argument('--categories', type=int, default=None)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write("Seeding {0} pages...".format(options['pages']))
+            seed_catalogue(options['pages'], options['categories'])
+            table = Page._meta.db_table
+
+            def scan():
+                # Unary + stops SQLite from using the index on views
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT id, views, title, url FROM {0} "
+                        "ORDER BY +views DESC, id LIMIT 5".format(table))
+                    cursor.fetchall()
+
+            def indexed():
+                list(Page.objects.order_by('-views', 'id')
+                     .values('id', 'views', 'title', 'url')[:5])
+
+            page_leaderboard.clear()
+            results = [
+                ("full scan", measure(scan, options['repeat'])),
+                ("indexed query", measure(indexed, options['repeat'])),
+                ("cached leaderboard",
+                 measure(page_leaderboard.top, options['repeat'])),
+            ]
+
+        for name, stats in results:
+            self.stdout.write(format_stats(name, stats))
@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from rango.bench import scratch_database
+
+
+class Command(BaseCommand):
+    help = ("Replay a burst of failed logins and report the worker CPU time "
+            "each attempt costs, with and without rango.logins in front of "
+            "authenticate().")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100,
+                            help="login attempts per scenario")
+        parser.add_argument('--iterations', type=int,
+                            help="PBKDF2 iterations (default: the settings')")
+
+    def handle(self, *args, **options):
+        overrides = {'ALLOWED_HOSTS': ['testserver']}
+        if options['iterations']:
+            overrides['RANGO_PASSWORD_ITERATIONS'] = options['iterations']
+        with scratch_database(), override_settings(**overrides):
+            cache.clear()
+            User.objects.create_user('victim', password='correct horse')
+            client = Client()
+            n = options['requests']
+            scenarios = [
+                ("authenticate(), wrong password", lambda i: authenticate(
+                    username='victim', password='guess{0}'.format(i))),
+                ("authenticate(), unknown username", lambda i: authenticate(
+                    username='nobody{0}'.format(i), password='guess')),
+                ("user_login, one IP, one username", lambda i: client.post(
+                    '/rango/login/', {'username': 'victim',
+                                      'password': 'guess{0}'.format(i)})),
+                ("user_login, one username, many IPs", lambda i: client.post(
+                    '/rango/login/', {'username': 'victim',
+                                      'password': 'guess{0}'.format(i)},
+                    REMOTE_ADDR='10.0.{0}.{1}'.format(i // 250, i % 250))),
+                ("user_login, unknown usernames", lambda i: client.post(
+                    '/rango/login/', {'username': 'nobody{0}'.format(i),
+                                      'password': 'guess'},
+                    REMOTE_ADDR='10.1.{0}.{1}'.format(i // 250, i % 250))),
+            ]
+            for name, attempt in scenarios:
+                cache.clear()
+                attempt(n)  # warm up (the username filter, the hash timing)
+                cache.clear()
+                refused = 0
+                wall, cpu = time.perf_counter(), time.process_time()
+                for i in range(n):
+                    response = attempt(i)
+                    refused += getattr(response, 'status_code', None) == 429
+                wall = time.perf_counter() - wall
+                cpu = time.process_time() - cpu
+                self.stdout.write(
+                    "{0:<36} CPU {1:8.2f} ms  wall {2:8.2f} ms per attempt, "
+                    "{3} of {4} refused".format(
+                        name, cpu / n * 1000, wall / n * 1000, refused, n))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rango import search
+from rango.bench import format_stats, measure, scratch_database, seed_catalogue
+
+
+class Command(BaseCommand):
+    help = ("Time page searches for words matching every page, a few pages "
+            "and one page.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        pages = options['pages']
+        # Seeded pages are titled "Page <n>" with URLs
+        # http://example.com/<n>/, so "page" and "example" match them all
+        queries = [
+            ("every page (title)", "page"),
+            ("every page (URL)", "example"),
+            ("every page, two words", "page example"),
+            ("URL boilerplate", "http www com"),
+            ("one letter", "p"),
+            ("prefix of many", "12"),
+            ("one page", str(pages - 1)),
+            ("no page", "nothing"),
+        ]
+        with scratch_database():
+            self.stdout.write("Seeding {0} pages...".format(pages))
+            start = time.time()
+            seed_catalogue(pages)
+            search.rebuild_index()
+            self.stdout.write("Seeded and indexed in {0:.1f}s".format(
+                time.time() - start))
+
+            results = [(name, measure(lambda: search.search(query),
+                                      options['repeat']))
+                       for name, query in queries]
+
+        for name, stats in results:
+            self.stdout.write(format_stats(name, stats))
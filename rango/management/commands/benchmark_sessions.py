@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rango.bench import format_stats, measure, scratch_database
+
+ENGINES = (
+    ('stock db backend', 'django.contrib.sessions.backends.db'),
+    ('rango.sessions', 'rango.sessions'),
+)
+
+
+class Command(BaseCommand):
+    help = "Compare session read/write latency of the stock and Rango engines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            with scratch_database(), override_settings(
+                    RANGO_SESSION_DIR=tmpdir, RANGO_SESSION_FLUSH_INTERVAL=1):
+                for name, engine in ENGINES:
+                    for label, stats in self.run(engine, options):
+                        self.stdout.write(format_stats(
+                            "{0}: {1}".format(name, label), stats))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def run(self, engine, options):
+        SessionStore = import_module(engine).SessionStore
+
+        keys = []
+        for i in range(options['sessions']):
+            session = SessionStore()
+            session['visits'] = i
+            session.save()
+            keys.append(session.session_key)
+
+        counter = [0]
+
+        def next_key():
+            counter[0] += 1
+            return keys[counter[0] % len(keys)]
+
+        def read():
+            SessionStore(next_key()).load()
+
+        def write():
+            session = SessionStore(next_key())
+            session['visits'] = session.get('visits', 0) + 1
+            session.save()
+
+        return [('read', measure(read, options['repeat'])),
+                ('read+write', measure(write, options['repeat']))]
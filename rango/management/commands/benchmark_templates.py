@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from rango.bench import format_stats, measure, scratch_database, seed_catalogue
+from rango.leaderboard import category_leaderboard, page_leaderboard
+
+SOURCE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+LOADERS = [
+    ("uncached (re-parse every render)", SOURCE_LOADERS),
+    ("watching cached loader (dev)",
+     [('rango.template_loaders.WatchingCachedLoader', SOURCE_LOADERS)]),
+    ("cached loader (production)",
+     [('django.template.loaders.cached.Loader', SOURCE_LOADERS)]),
+]
+
+
+class Command(BaseCommand):
+    help = ("Compare rendering the index page's template with and without "
+            "the cached template loaders.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_catalogue(options['pages'])
+            context = {'categories': category_leaderboard.top(),
+                       'pages': page_leaderboard.top(),
+                       'visits': 1}
+
+            results = []
+            for name, loaders in LOADERS:
+                engine = DjangoTemplates({
+                    'NAME': 'benchmark', 'APP_DIRS': False,
+                    'DIRS': settings.TEMPLATES[0]['DIRS'],
+                    'OPTIONS': {'loaders': loaders}})
+
+                def render():
+                    engine.get_template('rango/index.html').render(context)
+
+                # The first render is what a request pays without a warm-up
+                start = time.perf_counter()
+                render()
+                first = time.perf_counter() - start
+                results.append((name, first, measure(render, options['repeat'])))
+
+        for name, first, stats in results:
+            self.stdout.write("{0}\n  first render {1:9.3f} ms".format(
+                name, first * 1000))
+            self.stdout.write(format_stats("  later renders", stats))
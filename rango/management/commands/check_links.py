@@ -0,0 +1,63 @@
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rango.links import (UNREACHABLE, check_links, is_broken, pages_due,
+                         save_results)
+from rango.loader import DUMP_BATCH_SIZE, batched_rows
+
+
+class Command(BaseCommand):
+    help = ("Check pages' URLs and record the HTTP status each answers with. "
+            "Only pages not checked in the last --max-age days are checked.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=float,
+            default=getattr(settings, 'RANGO_LINK_CHECK_MAX_AGE', 7),
+            help="Re-check pages last checked more than this many days ago")
+        parser.add_argument('--all', action='store_true',
+                            help="Check every page, however recently checked")
+        parser.add_argument('--limit', type=int,
+                            help="Check at most this many pages")
+        parser.add_argument(
+            '--workers', type=int,
+            default=getattr(settings, 'RANGO_LINK_CHECK_WORKERS', 16))
+        parser.add_argument(
+            '--rate', type=float,
+            default=getattr(settings, 'RANGO_LINK_CHECK_RATE', 1),
+            help="Most requests a second to any one host (0 for no limit)")
+        parser.add_argument(
+            '--timeout', type=float,
+            default=getattr(settings, 'RANGO_LINK_CHECK_TIMEOUT', 10))
+
+    def handle(self, *args, **options):
+        pages = pages_due(None if options['all']
+                          else timedelta(days=options['max_age']))
+        # Read in short id-ordered batches, so the list of pages is never
+        # all in memory and no read stays open while the checks run
+        limit = options['limit']
+        rows = batched_rows(pages, ('url',),
+                            min(limit or DUMP_BATCH_SIZE, DUMP_BATCH_SIZE))
+        if limit is not None:
+            rows = islice(rows, limit)
+
+        start = time.perf_counter()
+        counts = save_results(check_links(
+            rows, workers=options['workers'], rate=options['rate'],
+            timeout=options['timeout']))
+        elapsed = time.perf_counter() - start
+
+        checked = sum(counts.values())
+        broken = sum(n for status, n in counts.items() if is_broken(status))
+        self.stdout.write(
+            "Checked {0} links in {1:.1f} s ({2:.0f} a minute): {3} broken, "
+            "{4} of them unreachable.".format(
+                checked, elapsed, checked * 60 / elapsed if elapsed else 0,
+                broken, counts[UNREACHABLE]))
+        if options['verbosity'] > 1:
+            for status, n in sorted(counts.items()):
+                self.stdout.write("  {0}: {1}".format(
+                    status or 'unreachable', n))
@@ -0,0 +1,75 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rango.loader import DUMP_BATCH_SIZE, dump_categories, dump_pages
+
+
+def parse_since(value):
+    # An ISO date or date and time, in the current time zone unless given
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError("--since must be a date or date and time, "
+                               "e.g. 2018-01-31 or 2018-01-31T12:00")
+        moment = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = ("Dump categories and pages to CSV or JSON Lines files (.gz to "
+            "compress) that load_rango can load back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', help="file to write categories to")
+        parser.add_argument('--pages', help="file to write pages to")
+        parser.add_argument('--since-id', type=int,
+                            help="only rows with a higher id (for an "
+                                 "incremental dump, the last id printed by "
+                                 "the previous one); with one file only")
+        parser.add_argument('--categories-since-id', type=int,
+                            help="only categories with a higher id")
+        parser.add_argument('--pages-since-id', type=int,
+                            help="only pages with a higher id")
+        parser.add_argument('--since',
+                            help="only pages added since this date or time, "
+                                 "and the categories they are in")
+        parser.add_argument('--chunk-size', type=int, default=DUMP_BATCH_SIZE,
+                            help="rows read per query")
+
+    def handle(self, *args, **options):
+        if not options['categories'] and not options['pages']:
+            raise CommandError("Give --categories and/or --pages")
+        # Categories and pages have ids of their own, so one last id can't
+        # be right for both
+        if options['since_id'] is not None and options['categories'] and \
+                options['pages']:
+            raise CommandError("--since-id is for one file; give "
+                               "--categories-since-id and --pages-since-id")
+        since = parse_since(options['since']) if options['since'] else None
+
+        if options['categories']:
+            self.dump("categories", dump_categories, options['categories'],
+                      options, since, options['categories_since_id'])
+        if options['pages']:
+            self.dump("pages", dump_pages, options['pages'], options, since,
+                      options['pages_since_id'])
+
+    def dump(self, label, dumper, path, options, since, since_id):
+        if since_id is None:
+            since_id = options['since_id']
+        start = time.time()
+        try:
+            count, last_id = dumper(path, since_id=since_id, since=since,
+                                    batch_size=options['chunk_size'])
+        except IOError as e:
+            raise CommandError("Could not write {0}: {1}".format(path, e))
+        elapsed = max(time.time() - start, 1e-6)
+        self.stdout.write(
+            "{0}: {1} rows in {2:.1f}s ({3:.0f} rows/sec), last id {4}".format(
+                label, count, elapsed, count / elapsed, last_id))
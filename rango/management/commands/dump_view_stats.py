@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+from rango.instrumentation import summarize
+
+
+class Command(BaseCommand):
+    help = ("Print per-view latency, query and template percentiles "
+            "published by running server processes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true',
+                            help="print raw JSON instead of a table")
+
+    def handle(self, *args, **options):
+        summary = summarize()
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2, sort_keys=True))
+            return
+        if not summary:
+            self.stdout.write("No requests recorded. Stats are shared through "
+                              "the cache, so it must be one all processes use.")
+            return
+
+        self.stdout.write("{0:<24} {1:>8} {2:>10} {3:>10} {4:>8} {5:>10} "
+                          "{6:>10} {7:>8}".format(
+                              "view", "requests", "p50 ms", "p99 ms",
+                              "queries", "db p99 ms", "tpl p99 ms", "session"))
+        for name, view in sorted(summary.items()):
+            self.stdout.write(
+                "{0:<24} {1:>8} {2:>10.2f} {3:>10.2f} {4:>8} {5:>10.2f} "
+                "{6:>10.2f} {7:>8}".format(
+                    name, view['requests'], view['wall']['p50'],
+                    view['wall']['p99'], view['queries']['p50'],
+                    view['query_time']['p99'], view['template_time']['p99'],
+                    view['sessions_modified']))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rango.loader import load_categories, load_pages, read_rows
+
+
+class Command(BaseCommand):
+    help = ("Bulk load categories and pages from CSV or JSON Lines files "
+            "(optionally .gz). Safe to re-run: existing rows are updated.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', help="file of categories")
+        parser.add_argument('--pages', help="file of pages")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not options['categories'] and not options['pages']:
+            raise CommandError("Give --categories and/or --pages")
+
+        # Categories first, so pages can refer to them
+        if options['categories']:
+            self.load("categories", load_categories, options['categories'],
+                      options['chunk_size'])
+        if options['pages']:
+            self.load("pages", load_pages, options['pages'],
+                      options['chunk_size'])
+
+    def load(self, label, loader, path, chunk_size):
+        start = time.time()
+        try:
+            counts = loader(read_rows(path), chunk_size)
+        except (IOError, ValueError, KeyError) as e:
+            raise CommandError("Could not load {0}: {1}".format(path, e))
+        elapsed = max(time.time() - start, 1e-6)
+        total = sum(counts.values())
+        self.stdout.write(
+            "{0}: {1} rows in {2:.1f}s ({3:.0f} rows/sec) - {4} created, "
+            "{5} updated, {6} unchanged, {7} skipped".format(
+                label, total, elapsed, total / elapsed, counts['created'],
+                counts['updated'], counts['unchanged'], counts['skipped']))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from rango.images import make_variants, record_variants
+from rango.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = ("Make the thumbnails of profile pictures that have none yet, e.g. "
+            "ones left over when the background queue was full.")
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(picture='') \
+            .filter(picture_variants='') \
+            .values_list('pk', 'picture', 'picture_sha256')
+        done = 0
+        for pk, name, digest in profiles.iterator():
+            record_variants(pk, make_variants(name, digest))
+            done += 1
+        self.stdout.write("Made thumbnails for {0} profiles.".format(done))
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rango.bench import format_stats, summarize
+
+# Run in a fresh interpreter per sample, so nothing is already imported
+SCRIPT = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "from tango_with_django_project.wsgi import application\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+class Command(BaseCommand):
+    help = ("Time importing wsgi.application (Django setup, app loading "
+            "and any warm-up) in a new process under each settings profile.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append',
+                            choices=['dev', 'prod'],
+                            help="Profile to measure (default: both)")
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        for profile in options['profile'] or ['dev', 'prod']:
+            env = dict(os.environ, RANGO_PROFILE=profile,
+                       DJANGO_SETTINGS_MODULE='tango_with_django_project.settings')
+            timings = []
+            for _ in range(options['repeat']):
+                process = subprocess.run(
+                    [sys.executable, '-c', SCRIPT], env=env,
+                    cwd=settings.BASE_DIR, stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE, universal_newlines=True)
+                if process.returncode:
+                    raise CommandError("Importing the {0} profile failed:\n{1}"
+                                       .format(profile, process.stderr))
+                timings.append(float(process.stdout.split()[-1]))
+            self.stdout.write(format_stats(profile, summarize(timings)))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rango.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.time()
+        indexed = rebuild_index(options['chunk_size'])
+        self.stdout.write("Indexed {0} pages in {1:.1f}s".format(
+            indexed, time.time() - start))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from rango.services import refresh_page_stats
+
+
+class Command(BaseCommand):
+    help = ("Recompute each category's page_count and last_page_added from "
+            "its pages.")
+
+    def handle(self, *args, **options):
+        fixed = refresh_page_stats()
+        self.stdout.write("Fixed {0} categories.".format(fixed))
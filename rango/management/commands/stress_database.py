@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.test import override_settings
+from rango.bench import scratch_database, seed_catalogue
+from rango.models import Category, Page
+
+
+def worker(seed, deadline, write_ratio, category_ids, page_count, results):
+    # Runs in a forked process, with its own database connections
+    rng = random.Random(seed)
+    counts = {'reads': 0, 'writes': 0, 'locked': 0, 'errors': 0}
+    while time.time() < deadline:
+        category_id = rng.choice(category_ids)
+        write = rng.random() < write_ratio
+        try:
+            if not write:
+                # What index and show_category read
+                list(Category.objects.order_by('-likes')[:5])
+                list(Page.objects.filter(category_id=category_id)
+                     .order_by('-views', 'id')[:20])
+            elif rng.random() < 0.4:
+                # A counter flush
+                Page.objects.filter(pk=rng.randint(1, page_count)).update(
+                    views=F('views') + 1)
+            elif rng.random() < 0.5:
+                # Read then write in one transaction, as the database session
+                # store and register do
+                with transaction.atomic():
+                    page = Page.objects.get(pk=rng.randint(1, page_count))
+                    page.views += 1
+                    page.save(update_fields=['views'])
+            else:
+                # add_page (its signal handlers write the search index too)
+                n = rng.randint(0, 10 ** 9)
+                Page.objects.create(category_id=category_id,
+                                    title="Stress {0}".format(n),
+                                    url="http://example.com/stress/{0}/".format(n))
+            counts['writes' if write else 'reads'] += 1
+        except OperationalError as e:
+            counts['locked' if 'locked' in str(e) else 'errors'] += 1
+    connections.close_all()
+    results.put(counts)
+
+
+class Command(BaseCommand):
+    help = ("Run reads and writes against a scratch SQLite file from several "
+            "processes at once and count \"database is locked\" errors.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--pages', type=int, default=10000)
+        parser.add_argument('--journal-mode',
+                            help="Override the journal_mode PRAGMA, e.g. "
+                                 "'delete' for SQLite's default")
+
+    def handle(self, *args, **options):
+        pragmas = dict(getattr(settings, 'RANGO_SQLITE_PRAGMAS', None) or {})
+        if options['journal_mode']:
+            pragmas['journal_mode'] = options['journal_mode']
+        directory = tempfile.mkdtemp(prefix='rango-stress')
+        try:
+            with override_settings(RANGO_SQLITE_PRAGMAS=pragmas), \
+                    scratch_database(name=os.path.join(directory, 'db.sqlite3')):
+                seed_catalogue(options['pages'])
+                category_ids = list(Category.objects.values_list('id', flat=True))
+                counts = self.run_workers(options, category_ids)
+        finally:
+            shutil.rmtree(directory)
+
+        self.stdout.write("PRAGMAs: {0}".format(
+            ", ".join("{0}={1}".format(k, v) for k, v in sorted(pragmas.items()))
+            or "SQLite defaults"))
+        self.stdout.write(
+            "{workers} workers, {seconds:g} s: {reads} reads, {writes} writes, "
+            "{locked} 'database is locked' errors, {errors} other errors".format(
+                workers=options['workers'], seconds=options['seconds'], **counts))
+
+    def run_workers(self, options, category_ids):
+        # Connections must not be shared across fork()
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        deadline = time.time() + options['seconds']
+        processes = [
+            context.Process(target=worker, args=(
+                i, deadline, options['write_ratio'], category_ids,
+                options['pages'], results))
+            for i in range(options['workers'])]
+        for process in processes:
+            process.start()
+        totals = {'reads': 0, 'writes': 0, 'locked': 0, 'errors': 0}
+        for _ in processes:
+            for key, value in results.get().items():
+                totals[key] += value
+        for process in processes:
+            process.join()
+        return totals
@@ -0,0 +1,173 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import Resolver404, resolve
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+from rango.caching import (get_category_pages_version, get_category_version,
+                           get_pages_version)
+from rango.counters import view_counter
+from rango.models import Category
+
+# A new visit is counted once this many seconds have passed since the last
+VISIT_INTERVAL = 60 * 60 * 24
+
+
+def record_visit(session, now=None):
+    """
+    Update the visit counters kept in the session and return the number of
+    visits. Both counters are plain integers (last_visit is a Unix
+    timestamp), so they suit any session serializer, signed cookies
+    included. The session is only assigned to - and so only saved - when
+    the count changes, i.e. at most once a day per visitor.
+    """
+    now = int(now if now is not None else time.time())
+    visits = session.get('visits')
+    last_visit = session.get('last_visit')
+
+    if not isinstance(visits, int) or not isinstance(last_visit, int):
+        # First visit, or counters left in the old formatted-string form
+        visits = int(visits or 1)
+    elif now - last_visit >= VISIT_INTERVAL:
+        visits += 1
+    else:
+        return visits
+
+    session['visits'] = visits
+    session['last_visit'] = now
+    return visits
+
+
+class VisitMiddleware(object):
+    # Counts visits to the site and makes the count available to views as
+    # request.visits. The count is taken when a page first shows it, so
+    # requests that don't (the JSON API, say) leave the session alone.
+    # Must come after SessionMiddleware.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.visits = SimpleLazyObject(
+            lambda: record_visit(request.session))
+        return self.get_response(request)
+
+
+# Views whose responses are cached for anonymous visitors, with the
+# version counters (besides the category version every page depends on
+# through the sidebar) that their content depends on
+CACHED_VIEWS = {
+    'index': lambda kwargs: [get_pages_version()],
+    'about': lambda kwargs: [],
+    'show_category': lambda kwargs: [
+        get_category_pages_version(kwargs['category_name_slug'])],
+    'sidebar': lambda kwargs: [],
+}
+
+# What a cached view still has to do when a hit is served without it, by
+# view name. Each is called with the hit_data the view set on its response
+# when the entry was cached (views that find nothing to count leave none).
+CACHE_HIT_HOOKS = {
+    'show_category': lambda data: view_counter.record(
+        Category, data['category_id']),
+}
+
+# Stands in for the visit count in cached pages; the count is the only
+# part of these pages that differs between anonymous visitors
+VISITS_PLACEHOLDER = mark_safe('<!--rango:visits-->')
+
+
+class AnonymousCacheMiddleware(object):
+    """
+    Caches whole responses of CACHED_VIEWS for anonymous GET requests.
+    Entries are keyed by URL and the version counters the page depends on,
+    so model signals purge them by bumping a counter. A hit is served
+    without running the view, so it touches neither the ORM nor the
+    template engine. Supports conditional GET with ETag and Last-Modified.
+
+    Must come after VisitMiddleware and AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        match = self.cacheable(request)
+        if match is None:
+            return self.get_response(request)
+
+        key = self.cache_key(request, match)
+        entry = cache.get(key)
+        if entry is None:
+            # Render with a placeholder where the visit count goes
+            visits, request.visits = request.visits, VISITS_PLACEHOLDER
+            try:
+                response = self.get_response(request)
+            finally:
+                request.visits = visits
+            if response.status_code != 200 or response.streaming or \
+                    response.cookies:
+                return self.finish(request, response, None)
+            entry = {'content': response.content,
+                     'content_type': response['Content-Type'],
+                     'hash': hashlib.md5(response.content).hexdigest(),
+                     'time': int(time.time()),
+                     'hit_data': getattr(response, 'hit_data', None)}
+            cache.set(key, entry, getattr(settings, 'RANGO_PAGE_CACHE_TIMEOUT', 600))
+        else:
+            # Let instrumentation etc. see which view this was
+            request.resolver_match = match
+            hook = CACHE_HIT_HOOKS.get(match.url_name)
+            if hook is not None and entry.get('hit_data'):
+                hook(entry['hit_data'])
+            response = HttpResponse(entry['content'],
+                                    content_type=entry['content_type'])
+        return self.finish(request, response, entry)
+
+    def cacheable(self, request):
+        if request.method not in ('GET', 'HEAD') or \
+                request.user.is_authenticated:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        return match if match.url_name in CACHED_VIEWS else None
+
+    def cache_key(self, request, match):
+        versions = [get_category_version()] + \
+            CACHED_VIEWS[match.url_name](match.kwargs)
+        return 'rango:response:{0}:{1}'.format(
+            hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest(),
+            '.'.join(str(v) for v in versions))
+
+    def finish(self, request, response, entry):
+        # Fill in the visit count, then answer conditional requests. The
+        # count is only taken for pages that show it: taking it saves the
+        # session, which for a new visitor means creating one.
+        placeholder = VISITS_PLACEHOLDER.encode('utf-8')
+        if entry is None:
+            if not response.streaming and placeholder in response.content:
+                response.content = response.content.replace(
+                    placeholder, str(request.visits).encode('utf-8'))
+            return response
+
+        etag = entry['hash']
+        last_modified = entry['time']
+        if placeholder in entry['content']:
+            visits = str(request.visits)
+            response.content = entry['content'].replace(
+                placeholder, visits.encode('utf-8'))
+            etag = '{0}-{1}'.format(etag, visits)
+            last_modified = max(last_modified,
+                                request.session.get('last_visit') or 0)
+        response['ETag'] = '"{0}"'.format(etag)
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=response['ETag'], last_modified=last_modified,
+            response=response)
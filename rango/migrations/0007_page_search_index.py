@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Full-text index over page titles and URLs (see rango.search). The
+    # prefix indexes keep "pyth*" style queries fast.
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE rango_page_search USING fts5("
+        "title, url, tokenize='unicode61', prefix='2 3')")
+    schema_editor.execute(
+        "INSERT INTO rango_page_search (rowid, title, url) "
+        "SELECT id, title, url FROM rango_page")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE rango_page_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0006_leaderboard_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
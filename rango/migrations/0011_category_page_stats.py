@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.utils.timezone
+
+
+def count_pages(apps, schema_editor):
+    Category = apps.get_model('rango', 'Category')
+    Page = apps.get_model('rango', 'Page')
+    counts = Page.objects.order_by().values('category') \
+        .annotate(count=Count('id')).values_list('category', 'count')
+    for category_id, count in counts:
+        Category.objects.filter(pk=category_id).update(page_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0010_userprofile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='last_page_added',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='page_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        # Added without a default first, so existing pages are left null
+        # rather than all getting the time of the migration
+        migrations.AddField(
+            model_name='page',
+            name='added',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='page',
+            name='added',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.RunPython(count_pages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0012_page_category_url_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='last_checked',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='link_status',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
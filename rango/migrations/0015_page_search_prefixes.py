@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from rango.search import url_text
+
+
+def create_index(schema_editor, prefix, clean_urls):
+    schema_editor.execute("DROP TABLE rango_page_search")
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE rango_page_search USING fts5("
+        "title, url, tokenize='unicode61', prefix='{0}')".format(prefix))
+    last_pk = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute("SELECT id, title, url FROM rango_page "
+                           "WHERE id > %s ORDER BY id LIMIT 5000", [last_pk])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            if clean_urls:
+                rows = [(pk, title, url_text(url)) for pk, title, url in rows]
+            cursor.executemany(
+                "INSERT INTO rango_page_search (rowid, title, url) "
+                "VALUES (%s, %s, %s)", rows)
+
+
+def widen_prefixes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Prefix queries of up to 6 letters are read from prefix indexes, so
+    # FTS5 can stop after the first few matches (see rango.search), and
+    # URLs are indexed without their scheme, "www." and domain ending
+    create_index(schema_editor, '2 3 4 5 6', clean_urls=True)
+
+
+def narrow_prefixes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    create_index(schema_editor, '2 3', clean_urls=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0014_categorylike'),
+    ]
+
+    operations = [
+        migrations.RunPython(widen_prefixes, narrow_prefixes),
+    ]
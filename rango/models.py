@@ -1,16 +1,69 @@
-from django.db import models
+import json
+
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.template.defaultfilters import slugify
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 class Category(models.Model):
     name = models.CharField(max_length=128, unique=True)
     views = models.IntegerField(default=0)
-    likes = models.IntegerField(default=0)
+    likes = models.IntegerField(default=0, db_index=True)
     slug = models.SlugField(unique=True)
+    # Kept up to date by Page.save() and the post_delete handler in
+    # rango.signals; rango.services.refresh_page_stats() recomputes them
+    page_count = models.IntegerField(default=0, db_index=True)
+    last_page_added = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # Field values as last loaded or saved, by attname (None for a new
+    # category). save() writes only the fields that differ from these, so
+    # it never overwrites counters incremented elsewhere in the meantime.
+    _loaded = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Category, cls).from_db(db, field_names, values)
+        instance._loaded = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super(Category, self).refresh_from_db(using=using, fields=fields)
+        self._remember(fields)
+
+    def _remember(self, fields=None):
+        # Deferred fields aren't in __dict__; they can't have changed
+        loaded = self._loaded or {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and \
+                    (fields is None or field.name in fields):
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded = loaded
+
+    def changed_fields(self):
+        return [field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname in self.__dict__
+                and (field.attname not in self._loaded or
+                     getattr(self, field.attname) != self._loaded[field.attname])]
 
     def save(self, *args, **kwargs):
-        self.slug = slugify(self.name)
+        if self._loaded is None:
+            # New (or built by hand): a full save, as before
+            self.slug = unique_slug(self.name, exclude_pk=self.pk)
+        else:
+            update_fields = kwargs.get('update_fields')
+            update_fields = self.changed_fields() if update_fields is None \
+                else list(update_fields)
+            if 'name' in update_fields and \
+                    self.name != self._loaded.get('name'):
+                self.slug = unique_slug(self.name, exclude_pk=self.pk)
+                if 'slug' not in update_fields:
+                    update_fields.append('slug')
+            # Nothing changed: Django skips the UPDATE and the signals
+            kwargs['update_fields'] = update_fields
         super(Category,self).save(*args, **kwargs)
+        self._remember(kwargs.get('update_fields'))
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -19,15 +72,126 @@ class Category(models.Model):
         return self.name
 
 
+def unique_slug(name, exclude_pk=None, reserved=()):
+    """
+    slugify(name), or if another category (or a slug in reserved) has that
+    already, the first of slug-2, slug-3, ... that's free. The slugs taken
+    are found with one query, a range on the slug index: the slug itself
+    and everything starting "slug-".
+    """
+    base = slugify(name)
+    taken = set(Category.objects
+                .filter(Q(slug=base) | Q(slug__gt=base + '-', slug__lt=base + '.'))
+                .exclude(pk=exclude_pk).values_list('slug', flat=True))
+    taken.update(reserved)
+    slug, n = base, 1
+    while slug in taken:
+        n += 1
+        slug = '{0}-{1}'.format(base, n)
+    return slug
+
+
+def unique_slugs(names):
+    """
+    Slugs for several new categories, unique among themselves too, in the
+    same order. Most names' slugs are free, which one IN query per 450
+    names confirms; only names whose slug is taken need unique_slug().
+    """
+    bases = [slugify(name) for name in names]
+    taken = set()
+    distinct = list(set(bases))
+    for i in range(0, len(distinct), 450):
+        taken.update(Category.objects.filter(slug__in=distinct[i:i + 450])
+                     .values_list('slug', flat=True))
+    slugs = []
+    used = set()
+    for name, base in zip(names, bases):
+        slug = base
+        if slug in taken or slug in used:
+            slug = unique_slug(name, reserved=used)
+        used.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
 class Page(models.Model):
     category = models.ForeignKey(Category)
     title = models.CharField(max_length=128)
     url = models.URLField()
-    views = models.IntegerField(default=0)
+    views = models.IntegerField(default=0, db_index=True)
+    # Null for pages added before this was recorded
+    added = models.DateTimeField(default=timezone.now, null=True, blank=True)
+    # Set by the check_links command (see rango.links): the HTTP status the
+    # URL answered with, 0 if it didn't answer, or null if never checked
+    link_status = models.IntegerField(null=True, blank=True)
+    last_checked = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Pages are identified by (category, title) when bulk loading
+            models.Index(fields=['category', 'title']),
+            # Listing a category's pages, most viewed first (rango.services)
+            models.Index(fields=['category', '-views', 'id']),
+            # Spotting URLs a category already has when adding pages
+            models.Index(fields=['category', 'url']),
+        ]
+
+    # The category as last loaded or saved, so save() can tell a page that
+    # moved to another category (None for a new page)
+    _loaded_category_id = None
+    # Set by save() while a moved page is saved, for rango.signals
+    _moved_from = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Page, cls).from_db(db, field_names, values)
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        moved = not adding and self._loaded_category_id is not None and \
+            self.category_id != self._loaded_category_id and \
+            (update_fields is None or 'category' in update_fields)
+        self._moved_from = self._loaded_category_id if moved else None
+        try:
+            with transaction.atomic():
+                super(Page, self).save(*args, **kwargs)
+                # Counted in the database, so concurrent adds don't clash
+                if adding:
+                    Category.objects.filter(pk=self.category_id).update(
+                        page_count=F('page_count') + 1,
+                        last_page_added=self.added or timezone.now())
+                elif moved:
+                    Category.objects.filter(pk=self._moved_from).update(
+                        page_count=F('page_count') - 1)
+                    Category.objects.filter(pk=self.category_id).update(
+                        page_count=F('page_count') + 1)
+        finally:
+            self._moved_from = None
+        if adding or moved:
+            self._loaded_category_id = self.category_id
 
     def __str__(self):
         return self.title
 
+class CategoryLike(models.Model):
+    # Who has liked a category: a user, or the session of an anonymous
+    # visitor. Each can like a category once (see services.like_category);
+    # Category.likes holds the count.
+    category = models.ForeignKey(Category)
+    user = models.ForeignKey(User, null=True, blank=True)
+    session_key = models.CharField(max_length=40, null=True, blank=True)
+    added = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = [('category', 'user'), ('category', 'session_key')]
+
+    def __str__(self):
+        return "{0} likes {1}".format(self.user or self.session_key,
+                                      self.category_id)
+
 class UserProfile(models.Model):
     # Links UserProfile to a User model instance
     user = models.OneToOneField(User)
@@ -35,6 +199,18 @@ class UserProfile(models.Model):
     # Additional attributes that we want to include
     website = models.URLField(blank=True)
     picture = models.ImageField(upload_to='profile_images', blank=True)
+    # Content hash of the picture, and the thumbnails made from it as JSON:
+    # {"64": {"webp": <name>, "jpg": <name>}, ...} (see rango.images)
+    picture_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    picture_variants = models.TextField(blank=True, default='')
+
+    def picture_url(self, size, ext='jpg'):
+        # URL of a thumbnail, or of the original while thumbnails are made
+        variants = json.loads(self.picture_variants or '{}')
+        name = variants.get(str(size), {}).get(ext)
+        if name:
+            return default_storage.url(name)
+        return self.picture.url if self.picture else ''
 
     def __str__(self):
         return self.user.username
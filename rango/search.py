@@ -0,0 +1,154 @@
+import re
+from urllib.parse import urlsplit
+
+from django.db import connection, transaction
+from rango.models import Page
+
+# Full-text search over Page titles and URLs, backed by an SQLite FTS5
+# table (created in migration 0007) that holds one row per page, keyed by
+# the page id. Signal handlers keep it in step with Page saves and deletes;
+# the rebuild_search_index command recreates it from scratch.
+#
+# Ranking with bm25() scores every matching row before the LIMIT applies,
+# so a word found in most pages would cost a scan of the whole index. The
+# matches are counted first, reading no more than RANK_LIMIT + 1 of them;
+# when there are more, the newest are returned unranked, which FTS5 reads
+# in rowid order and stops after `limit` of. That only works for queries
+# FTS5 can read lazily: exact words, and prefixes it has an index for.
+
+SEARCH_TABLE = 'rango_page_search'
+
+# Matches in the title count for more than matches in the URL
+TITLE_WEIGHT = 10.0
+URL_WEIGHT = 1.0
+
+# Most pages ranked per query
+RANK_LIMIT = 1000
+
+# The index has prefix indexes of 2 to this many letters (migration 0015).
+# A longer prefix is read by merging every term it matches up front, so
+# when its first letters are common the word is matched exactly instead.
+MAX_PREFIX_LENGTH = 6
+
+# Shorter words are ignored: the index has no prefixes of one letter, so
+# each would mean merging every term it starts
+MIN_WORD_LENGTH = 2
+
+# Words in nearly every URL. They aren't indexed (see url_text), so they
+# are dropped from queries too.
+URL_WORDS = frozenset(['http', 'https', 'www', 'com', 'org', 'net'])
+
+
+def url_text(url):
+    # What is indexed of a URL: the host without "www." and the domain
+    # ending, then the path and query string
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname or ''
+    except ValueError:
+        return url
+    labels = host.split('.')
+    if labels[0] == 'www':
+        labels = labels[1:]
+    if len(labels) > 1:
+        labels = labels[:-1]
+    return ' '.join(part for part in ('.'.join(labels), parts.path,
+                                      parts.query) if part)
+
+
+def index_page(page):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM {0} WHERE rowid = %s".format(SEARCH_TABLE),
+                       [page.pk])
+        cursor.execute("INSERT INTO {0} (rowid, title, url) "
+                       "VALUES (%s, %s, %s)".format(SEARCH_TABLE),
+                       [page.pk, page.title, url_text(page.url)])
+
+
+def unindex_page(pk):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM {0} WHERE rowid = %s".format(SEARCH_TABLE),
+                       [pk])
+
+
+def index_pages(rows, replace=True):
+    # rows are (id, title, url) tuples. Existing entries for those ids are
+    # replaced; pass replace=False when the index is known to be empty.
+    rows = [(pk, title, url_text(url)) for pk, title, url in rows]
+    with connection.cursor() as cursor:
+        if replace:
+            cursor.executemany("DELETE FROM {0} WHERE rowid = %s".format(SEARCH_TABLE),
+                               [(row[0],) for row in rows])
+        cursor.executemany("INSERT INTO {0} (rowid, title, url) "
+                           "VALUES (%s, %s, %s)".format(SEARCH_TABLE), rows)
+
+
+def clear_index():
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM {0}".format(SEARCH_TABLE))
+
+
+def rebuild_index(chunk_size=5000):
+    # Stream pages by primary key one chunk at a time, so memory use stays
+    # flat however many pages there are
+    clear_index()
+
+    last_pk = 0
+    indexed = 0
+    while True:
+        rows = list(Page.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('id', 'title', 'url')[:chunk_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            index_pages(rows, replace=False)
+        last_pk = rows[-1][0]
+        indexed += len(rows)
+    return indexed
+
+
+def query_words(query):
+    return [word for word in re.findall(r'\w+', query.lower())
+            if len(word) >= MIN_WORD_LENGTH and word not in URL_WORDS]
+
+
+def count_matches(cursor, match):
+    # Pages matching, counted up to RANK_LIMIT + 1
+    cursor.execute(
+        "SELECT count(*) FROM (SELECT rowid FROM {0} WHERE {0} MATCH %s "
+        "LIMIT %s)".format(SEARCH_TABLE), [match, RANK_LIMIT + 1])
+    return cursor.fetchone()[0]
+
+
+def word_match(cursor, word):
+    # A word as an FTS5 query: a prefix of a title or URL token, or the
+    # whole token (see MAX_PREFIX_LENGTH). Quoting it stops FTS5 syntax
+    # (AND, NEAR, column filters...) in the input from being interpreted.
+    if len(word) <= MAX_PREFIX_LENGTH or count_matches(
+            cursor, '"{0}"*'.format(word[:MAX_PREFIX_LENGTH])) <= RANK_LIMIT:
+        return '"{0}"*'.format(word)
+    return '"{0}"'.format(word)
+
+
+def search(query, limit=20):
+    words = query_words(query)
+    if not words:
+        return []
+
+    with connection.cursor() as cursor:
+        # Every word must match
+        match = ' '.join(word_match(cursor, word) for word in words)
+        if count_matches(cursor, match) <= RANK_LIMIT:
+            order = "bm25({0}, %s, %s)".format(SEARCH_TABLE)
+            params = [TITLE_WEIGHT, URL_WEIGHT]
+        else:
+            order, params = "rowid DESC", []
+        cursor.execute(
+            "SELECT rowid FROM {0} WHERE {0} MATCH %s "
+            "ORDER BY {1} LIMIT %s".format(SEARCH_TABLE, order),
+            [match] + params + [limit])
+        ids = [row[0] for row in cursor.fetchall()]
+
+    # Keep the ranking order from the index
+    pages = Page.objects.in_bulk(ids)
+    return [pages[pk] for pk in ids if pk in pages]
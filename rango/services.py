@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q
+from rango.caching import bump_category_version
+from rango.counters import view_counter
+from rango.models import Category, CategoryLike, Page
+
+# Pages within a category are listed most viewed first; the id breaks ties
+# so the order is total and can be paged through with a keyset cursor.
+PAGE_ORDERING = ('-views', 'id')
+
+
+def get_category(slug):
+    # The category with this slug, or None if there isn't one
+    try:
+        return Category.objects.get(slug=slug)
+    except Category.DoesNotExist:
+        return None
+
+
+def make_cursor(page):
+    return format_cursor(page.views, page.id)
+
+
+def format_cursor(views, pk):
+    return "{0}.{1}".format(views, pk)
+
+
+def parse_cursor(cursor):
+    # (views, id) of the last page shown, or None for the first page
+    try:
+        views, pk = cursor.split('.')
+        return int(views), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def pages_after(queryset, cursor):
+    # Pages that come after the cursor in PAGE_ORDERING. The views__lte
+    # bound is a range on the (category, -views, id) index, so SQLite seeks
+    # straight to the cursor rather than skipping over earlier pages the way
+    # OFFSET does; the second filter only steps past ties on views.
+    position = parse_cursor(cursor)
+    if position is None:
+        return queryset
+    views, pk = position
+    return queryset.filter(views__lte=views).filter(
+        Q(views__lt=views) | Q(id__gt=pk))
+
+
+def get_category_detail(slug, cursor=None, per_page=None):
+    """
+    Return (category, pages, next_cursor) for one screenful of a category's
+    pages. category is None if the slug doesn't exist and next_cursor is
+    None on the last screen.
+
+    Pages are fetched with their category joined in, so this is a single
+    query unless the category turns out to have no pages (after the cursor).
+    """
+    per_page = per_page or getattr(settings, 'RANGO_PAGES_PER_SCREEN', 20)
+    queryset = Page.objects.select_related('category') \
+        .filter(category__slug=slug).order_by(*PAGE_ORDERING)
+    pages = list(pages_after(queryset, cursor)[:per_page + 1])
+
+    if pages:
+        category = pages[0].category
+    else:
+        category = get_category(slug)
+
+    next_cursor = None
+    if len(pages) > per_page:
+        pages = pages[:per_page]
+        next_cursor = make_cursor(pages[-1])
+    return category, pages, next_cursor
+
+
+def refresh_page_stats(category_ids=None):
+    """
+    Recompute Category.page_count and last_page_added from the pages, for
+    the given categories or for all of them, with one grouped query (per
+    500 categories when given). Only categories whose values were wrong
+    are written; returns how many there were.
+    """
+    if category_ids is None:
+        batches = [None]
+    else:
+        category_ids = list(category_ids)
+        batches = [category_ids[i:i + 500]
+                   for i in range(0, len(category_ids), 500)]
+
+    fixed = 0
+    with transaction.atomic():
+        for batch in batches:
+            pages = Page.objects.order_by()
+            categories = Category.objects.all()
+            if batch is not None:
+                pages = pages.filter(category_id__in=batch)
+                categories = categories.filter(pk__in=batch)
+            stats = dict(
+                (category_id, (count, last))
+                for category_id, count, last in pages.values('category')
+                .annotate(count=Count('id'), last=Max('added'))
+                .values_list('category', 'count', 'last'))
+
+            for pk, count, last in categories.values_list(
+                    'id', 'page_count', 'last_page_added'):
+                new_count, new_last = stats.get(pk, (0, None))
+                # Pages from before 'added' was recorded have none; keep
+                # what the category has then
+                new_last = new_last or last
+                if (count, last) != (new_count, new_last):
+                    Category.objects.filter(pk=pk).update(
+                        page_count=new_count, last_page_added=new_last)
+                    fixed += 1
+    if fixed:
+        bump_category_version()
+    return fixed
+
+
+def like_category(category, user=None, session_key=None):
+    """
+    Record a like of category by user (or, for anonymous visitors, by the
+    session) unless they have liked it before. Returns True if the like is
+    new.
+
+    The check is the INSERT itself: a repeat breaks the unique constraint,
+    so no lookup is needed and two requests at once can't both count.
+    Category.likes is incremented through the view counter, so the row is
+    never read or saved here; increments are added up in memory and written
+    with one UPDATE per flush however many arrive.
+    """
+    try:
+        with transaction.atomic():
+            CategoryLike.objects.create(category=category, user=user,
+                                        session_key=session_key)
+    except IntegrityError:
+        return False
+    view_counter.record(Category, category.pk, field='likes')
+    return True
+
+
+def category_likes(category):
+    # Likes including those not written yet
+    return category.likes + view_counter.pending(Category, category.pk, 'likes')
@@ -0,0 +1,377 @@
+"""
+Session engine that sits in front of the database. Enable it with
+
+    SESSION_ENGINE = 'rango.sessions'
+
+Sessions live in three places:
+
+* a small LRU of decoded sessions in each process, so a repeat read costs a
+  single stat() call;
+* a directory of session files (RANGO_SESSION_DIR) shared by every worker
+  process on the machine. This is the authoritative copy: files are
+  replaced atomically, and each LRU entry is checked against its file's
+  inode and modification time, so a change made by one process is seen at
+  once by the others;
+* the django_session table, which is written behind. Saves only mark a
+  session dirty; a background thread writes all dirty sessions every
+  RANGO_SESSION_FLUSH_INTERVAL seconds in one transaction, so a session
+  saved many times in that window costs one database write.
+
+The database copy is what survives the session directory being wiped: a
+session that is missing from the directory is read from the database and
+put back.
+"""
+import atexit
+import calendar
+import copy
+import errno
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import VALID_KEY_CHARS, CreateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Stay under SQLite's limit on query parameters for IN (...) lookups
+LOOKUP_BATCH_SIZE = 500
+
+
+def to_timestamp(value):
+    return calendar.timegm(value.utctimetuple())
+
+
+def from_timestamp(value):
+    value = datetime.utcfromtimestamp(value)
+    if settings.USE_TZ:
+        return timezone.make_aware(value, timezone.utc)
+    return timezone.make_naive(timezone.make_aware(value, timezone.utc))
+
+
+class SessionFiles(object):
+    # One JSON file per session: {"data": <encoded session>, "expire": <ts>}
+
+    def __init__(self, directory):
+        self.directory = directory
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def path(self, session_key):
+        return os.path.join(self.directory, session_key)
+
+    def version(self, session_key):
+        # Every write renames a new file into place, so the inode and mtime
+        # together change whenever the session does
+        try:
+            return self._version(os.stat(self.path(session_key)))
+        except OSError:
+            return None
+
+    def _version(self, stat):
+        return stat.st_ino, stat.st_mtime_ns
+
+    def read(self, session_key):
+        # (data, expire, version), or None if missing, unreadable or expired
+        try:
+            with open(self.path(session_key), 'r') as f:
+                version = self._version(os.fstat(f.fileno()))
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if entry['expire'] <= time.time():
+            return None
+        return entry['data'], entry['expire'], version
+
+    def write(self, session_key, data, expire, must_create=False):
+        path = self.path(session_key)
+        if must_create:
+            # Claim the key; O_EXCL fails if another process got there first
+            try:
+                os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+            except OSError as e:
+                if e.errno == errno.EEXIST:
+                    raise CreateError
+                raise
+
+        # Write a temporary file and rename it over the old one, so readers
+        # only ever see a complete file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'data': data, 'expire': expire}, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return self.version(session_key)
+
+    def delete(self, session_key):
+        try:
+            os.unlink(self.path(session_key))
+        except OSError:
+            pass
+
+    def clear_expired(self):
+        for name in os.listdir(self.directory):
+            if not name.startswith('.') and self.read(name) is None:
+                self.delete(name)
+
+    def lock(self):
+        # Exclusive lock shared by all processes using this directory
+        return FileLock(os.path.join(self.directory, '.lock'))
+
+
+class FileLock(object):
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+
+class SessionLRU(object):
+    # Decoded sessions, each tagged with the version of the file it came from
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_key, version):
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is None:
+                return None
+            entry_version, expire, loaded_at, data = entry
+            now = time.time()
+            if entry_version != version or expire <= now or \
+                    now - loaded_at > self.ttl:
+                del self._entries[session_key]
+                return None
+            self._entries.move_to_end(session_key)
+        # Callers get their own copy to modify
+        return copy.deepcopy(data)
+
+    def set(self, session_key, version, expire, data):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[session_key] = (version, expire, time.time(),
+                                          copy.deepcopy(data))
+            self._entries.move_to_end(session_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, session_key):
+        with self._lock:
+            self._entries.pop(session_key, None)
+
+
+class WriteBehind(object):
+    # Writes dirty sessions from the session files to the database
+
+    def __init__(self, files, model, flush_interval):
+        self.files = files
+        self.model = model
+        self.flush_interval = flush_interval
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def mark(self, session_key):
+        if self.flush_interval <= 0:
+            self._write([session_key])
+            return
+        with self._lock:
+            self._dirty.add(session_key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='rango-session-writer')
+                self._thread.daemon = True
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def discard(self, session_key):
+        with self._lock:
+            self._dirty.discard(session_key)
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if dirty:
+            try:
+                self._write(dirty)
+            except Exception:
+                with self._lock:
+                    self._dirty |= dirty
+                raise
+        return len(dirty)
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _write(self, session_keys):
+        # Take the data from the files rather than from memory: if another
+        # process saved the session since, the newer data is what gets
+        # written. The lock stops two processes inserting the same new
+        # session at once.
+        with self.files.lock():
+            rows = {}
+            for session_key in session_keys:
+                entry = self.files.read(session_key)
+                if entry is not None:
+                    rows[session_key] = (entry[0], from_timestamp(entry[1]))
+            if not rows:
+                return
+
+            with transaction.atomic():
+                keys = list(rows)
+                existing = set()
+                for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                    existing.update(self.model.objects.filter(
+                        session_key__in=keys[i:i + LOOKUP_BATCH_SIZE])
+                        .values_list('session_key', flat=True))
+                for session_key in existing:
+                    data, expire_date = rows[session_key]
+                    self.model.objects.filter(session_key=session_key).update(
+                        session_data=data, expire_date=expire_date)
+                self.model.objects.bulk_create(
+                    [self.model(session_key=session_key, session_data=data,
+                                expire_date=expire_date)
+                     for session_key, (data, expire_date) in rows.items()
+                     if session_key not in existing])
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write sessions to the database")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    # (files, lru, writer) shared by every SessionStore in this process
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            directory = getattr(settings, 'RANGO_SESSION_DIR', None) or \
+                os.path.join(tempfile.gettempdir(), 'rango_sessions')
+            files = SessionFiles(directory)
+            _backend = (
+                files,
+                SessionLRU(getattr(settings, 'RANGO_SESSION_LRU_SIZE', 10000),
+                           getattr(settings, 'RANGO_SESSION_LRU_TTL', 300)),
+                WriteBehind(files, SessionStore.get_model_class(),
+                            getattr(settings, 'RANGO_SESSION_FLUSH_INTERVAL', 5)),
+            )
+        return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting.startswith('RANGO_SESSION_') and _backend is not None:
+        _backend[2].stop()
+        _backend = None
+
+
+class SessionStore(DBStore):
+
+    def __init__(self, session_key=None):
+        super(SessionStore, self).__init__(session_key)
+        self.files, self.lru, self.writer = get_backend()
+
+    def _validate_session_key(self, key):
+        # Keys are used as file names, so only allow the characters Django
+        # generates them from
+        return super(SessionStore, self)._validate_session_key(key) and \
+            set(key) <= set(VALID_KEY_CHARS)
+
+    def load(self):
+        session_key = self.session_key
+        version = self.files.version(session_key) if session_key else None
+
+        if version is not None:
+            data = self.lru.get(session_key, version)
+            if data is not None:
+                return data
+            entry = self.files.read(session_key)
+            if entry is not None:
+                encoded, expire, version = entry
+                data = self.decode(encoded)
+                self.lru.set(session_key, version, expire, data)
+                return data
+
+        # Not in the session files (e.g. they were cleared): fall back to
+        # the database and put the session back in the files
+        s = self.model.objects.filter(
+            session_key=session_key, expire_date__gt=timezone.now()).first() \
+            if session_key else None
+        if s is None:
+            self._session_key = None
+            return {}
+        expire = to_timestamp(s.expire_date)
+        version = self.files.write(session_key, s.session_data, expire)
+        data = self.decode(s.session_data)
+        self.lru.set(session_key, version, expire, data)
+        return data
+
+    def exists(self, session_key):
+        # Only used to check that a new random key is free; checking the
+        # files (which every live session is in) saves a database read
+        return bool(session_key) and \
+            self.files.version(session_key) is not None
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        expire = to_timestamp(self.get_expiry_date())
+        version = self.files.write(self.session_key, self.encode(data),
+                                   expire, must_create=must_create)
+        self.lru.set(self.session_key, version, expire, data)
+        self.writer.mark(self.session_key)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self.writer.discard(session_key)
+        self.lru.discard(session_key)
+        self.files.delete(session_key)
+        super(SessionStore, self).delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        get_backend()[0].clear_expired()
+        super(SessionStore, cls).clear_expired()
@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rango.models import Category, Page
+from rango.caching import (bump_category_version, bump_category_pages_version,
+                           bump_counters_version, bump_pages_version)
+from rango.counters import counters_flushed
+from rango.leaderboard import LEADERBOARDS, category_leaderboard, page_leaderboard
+from rango import search
+from rango.logins import users_added, usernames_changed
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    # Any change to a category invalidates the cached sidebar list
+    bump_category_version()
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    category_leaderboard.update(instance)
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    category_leaderboard.remove(instance.pk)
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+def page_changed(sender, instance, **kwargs):
+    # Purge cached responses showing this page: the index page and the
+    # page's category
+    bump_pages_version()
+    try:
+        bump_category_pages_version(instance.category.slug)
+    except Category.DoesNotExist:
+        # Category already gone, and with it its cached pages
+        pass
+    if instance._moved_from is not None:
+        # And the category the page has just left
+        for slug in Category.objects.filter(pk=instance._moved_from) \
+                .values_list('slug', flat=True):
+            bump_category_pages_version(slug)
+
+@receiver(post_save, sender=Page)
+def page_saved(sender, instance, created, **kwargs):
+    page_leaderboard.update(instance)
+    search.index_page(instance)
+    if created or instance._moved_from is not None:
+        # Page.save() counted it; the sidebar shows the counts
+        bump_category_version()
+
+@receiver(post_delete, sender=Page)
+def page_deleted(sender, instance, **kwargs):
+    page_leaderboard.remove(instance.pk)
+    search.unindex_page(instance.pk)
+    # Runs in the same transaction as the delete, including deletes of
+    # whole querysets
+    Category.objects.filter(pk=instance.category_id).update(
+        page_count=F('page_count') - 1)
+    bump_category_version()
+
+@receiver(counters_flushed)
+def counters_written(sender, updates, **kwargs):
+    # Batched increments bypass save(), so refresh any board whose counter
+    # was touched. Each rebuild is one query on an indexed column.
+    bump_counters_version()
+    touched = set((model, field) for model, field, pk in updates)
+    for board in LEADERBOARDS:
+        if (board.model, board.field) in touched:
+            board.rebuild()
+            bump_pages_version()
+
+@receiver(post_save, sender=User)
+def user_saved(sender, created, update_fields, **kwargs):
+    # Logins only save last_login (and sometimes password), so this is
+    # really for new users and admin edits. New users are added to the
+    # username filters; other edits might be renames, which need them
+    # rebuilt. Other processes see the user once it is committed; bumping
+    # now as well lets this transaction see it.
+    if created:
+        users_added()
+        transaction.on_commit(users_added)
+    elif update_fields is None or 'username' in update_fields:
+        usernames_changed()
+        transaction.on_commit(usernames_changed)
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, **kwargs):
+    transaction.on_commit(usernames_changed)
@@ -0,0 +1,19 @@
+# Percentiles of timing samples, for the benchmarks (rango.bench) and the
+# per-view request instrumentation. Imports nothing from the app, so the
+# middleware can use it without loading the benchmark helpers.
+
+
+def percentile(values, pct):
+    # values must be sorted
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {'runs': len(timings),
+            'mean': sum(timings) / len(timings),
+            'p50': percentile(timings, 50),
+            'p99': percentile(timings, 99)}
@@ -0,0 +1,79 @@
+"""
+Template loading.
+
+Django's cached loader compiles each template once per process and keeps
+the result, which is what production runs with. Two additions:
+
+* WatchingCachedLoader is a cached loader for development. It remembers
+  the modification time of each template's file and recompiles only the
+  templates whose file has changed, so edits show up without a restart
+  while unchanged templates stay compiled.
+* warm_templates() compiles every template under templates/rango up front,
+  so the first request to each view does not pay for parsing. RangoConfig
+  runs it at startup when RANGO_TEMPLATE_WARMUP is set.
+"""
+import os
+
+from django.template import TemplateDoesNotExist, engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class WatchingCachedLoader(CachedLoader):
+
+    def __init__(self, engine, loaders):
+        super(WatchingCachedLoader, self).__init__(engine, loaders)
+        self.mtimes = {}
+
+    def get_template(self, template_name, template_dirs=None, skip=None):
+        key = self.cache_key(template_name, template_dirs, skip)
+        cached = self.get_template_cache.get(key)
+        # Only compiled templates have a recorded mtime; missing templates
+        # are left to the cached loader
+        if key in self.mtimes:
+            if file_mtime(cached.origin.name) == self.mtimes[key]:
+                return cached
+            del self.get_template_cache[key], self.mtimes[key]
+
+        template = super(WatchingCachedLoader, self).get_template(
+            template_name, template_dirs, skip)
+        self.mtimes[key] = file_mtime(template.origin.name)
+        return template
+
+    def reset(self):
+        super(WatchingCachedLoader, self).reset()
+        self.mtimes.clear()
+
+
+def template_names(prefix='rango'):
+    # Names of the templates under <dir>/<prefix> in every template directory
+    names = set()
+    for engine in engines.all():
+        for directory in getattr(engine, 'dirs', []):
+            root = os.path.join(directory, prefix)
+            for path, _, files in os.walk(root):
+                for filename in files:
+                    if filename.endswith('.html'):
+                        names.add(os.path.relpath(
+                            os.path.join(path, filename), directory))
+    return sorted(name.replace(os.sep, '/') for name in names)
+
+
+def warm_templates(prefix='rango'):
+    # Compile the templates into each engine's cached loader. Returns the
+    # names compiled.
+    warmed = []
+    for name in template_names(prefix):
+        for engine in engines.all():
+            try:
+                engine.get_template(name)
+            except TemplateDoesNotExist:
+                continue
+        warmed.append(name)
+    return warmed
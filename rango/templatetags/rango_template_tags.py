@@ -1,9 +1,24 @@
 from django import template
-from rango.models import Category
+from rango.caching import category_entry
+from rango.caching import get_category_list as get_cached_category_list
 
 register = template.Library()
 
 @register.inclusion_tag('rango/cats.html')
 def get_category_list(cat=None):
-    return {'cats': Category.objects.all(),
-            'act_cat': cat}
+    # The first chunk of categories comes from the cache; the rest are
+    # fetched by the "More" link from views.sidebar. The active category is
+    # highlighted by comparing slugs in the template, and added at the end
+    # if it's not in the first chunk, so no query is needed for that either.
+    cats, next_cursor = get_cached_category_list()
+    if cat and all(c['slug'] != cat.slug for c in cats):
+        cats = cats + [category_entry(cat.name, cat.slug, cat.page_count,
+                                      cat.last_page_added)]
+    return {'cats': cats,
+            'act_cat': cat,
+            'next_cursor': next_cursor}
+
+@register.simple_tag
+def profile_picture_url(profile, size=64, ext='jpg'):
+    # Thumbnail of a profile picture, so pages don't serve full-size uploads
+    return profile.picture_url(size, ext)
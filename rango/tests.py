@@ -1,3 +1,1331 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template import Context, Template
+from django.utils import timezone
+from django.template.backends.django import DjangoTemplates
+from django.test import (Client, TestCase, TransactionTestCase,
+                         modify_settings, override_settings)
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rango.backends.filecache import FileBasedCache
+from rango.bench import compare
+from rango.db import ReadWriteRouter, apply_sqlite_pragmas
+from rango.counters import ViewCounter, view_counter
+from rango.leaderboard import category_leaderboard, page_leaderboard
+from rango.middleware import record_visit
+from rango import api, images, instrumentation, links, logins, search
+from rango.loader import add_pages, load_categories, load_pages
+from rango.services import get_category_detail, refresh_page_stats
+from rango.sessions import SessionFiles, SessionLRU, SessionStore, get_backend
+from rango.template_loaders import warm_templates
+from rango.models import (Category, CategoryLike, Page, UserProfile,
+                          unique_slug)
+
+
+class CategoryListTagTests(TestCase):
+    template = Template("{% load rango_template_tags %}"
+                        "{% get_category_list act %}")
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, act=None):
+        return self.template.render(Context({'act': act}))
+
+    def test_sidebar_uses_no_queries_once_cached(self):
+        python = Category.objects.create(name="Python")
+        Category.objects.create(name="Django")
+        self.render()
+
+        with self.assertNumQueries(0):
+            html = self.render(python)
+
+        self.assertIn('<a href="/rango/category/python/">Python</a>', html)
+        self.assertIn('<strong>', html)
+
+    def test_sidebar_invalidated_on_category_change(self):
+        Category.objects.create(name="Python")
+        self.assertNotIn("Django", self.render())
+
+        django = Category.objects.create(name="Django")
+        self.assertIn("Django", self.render())
+
+        django.delete()
+        self.assertNotIn("Django", self.render())
+
+    @override_settings(RANGO_SIDEBAR_SIZE=2)
+    def test_large_sidebars_are_chunked(self):
+        for name in ("Ada", "Bash", "C", "Dart", "Elm"):
+            Category.objects.create(name=name)
+        html = self.render(Category.objects.get(name="Elm"))
+        self.assertIn("Bash", html)
+        self.assertNotIn("Dart", html)
+        # The active category is always shown
+        self.assertIn("<strong>", html)
+        self.assertIn('href="/rango/sidebar/?after=Bash"', html)
+
+        data = json.loads(self.client.get('/rango/sidebar/?after=Bash')
+                          .content.decode())
+        self.assertEqual([c['name'] for c in data['categories']], ["C", "Dart"])
+        self.assertEqual(data['categories'][0]['url'], '/rango/category/c/')
+        data = json.loads(self.client.get(data['next']).content.decode())
+        self.assertEqual([c['name'] for c in data['categories']], ["Elm"])
+        self.assertIsNone(data['next'])
+
+
+class ViewCounterTests(TestCase):
+
+    def setUp(self):
+        self.counter = ViewCounter(flush_interval=3600, max_pending=3)
+        self.category = Category.objects.create(name="Python", views=10)
+
+    def tearDown(self):
+        self.counter.stop()
+
+    def test_increments_are_batched_until_flush(self):
+        page = Page.objects.create(category=self.category, title="Docs",
+                                   url="http://docs.python.org/")
+        self.counter.record(Category, self.category.pk)
+        self.counter.record(Category, self.category.pk)
+        self.counter.record(Page, page.pk)
+
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.views, 10)
+        self.assertEqual(self.counter.pending(Category, self.category.pk), 2)
+
+        self.assertEqual(self.counter.flush(), 2)
+        self.category.refresh_from_db()
+        page.refresh_from_db()
+        self.assertEqual(self.category.views, 12)
+        self.assertEqual(page.views, 1)
+
+    def test_flusher_woken_when_too_many_counters_pending(self):
+        for i in range(3):
+            Category.objects.create(name="Category {0}".format(i))
+        written = threading.Event()
+        writers = []
+
+        def write(updates):
+            writers.append(threading.current_thread().name)
+            written.set()
+
+        with mock.patch.object(self.counter, '_write', side_effect=write):
+            for category in Category.objects.all():
+                self.counter.record(Category, category.pk)
+            # The request thread only queues; the flusher does the write
+            self.assertTrue(written.wait(5))
+        self.assertEqual(writers, ['rango-view-counter'])
+        self.assertEqual(self.counter.pending(Category, self.category.pk), 0)
+
+    @override_settings(RANGO_COUNTER_FLUSH_INTERVAL=0)
+    def test_show_category_counts_view(self):
+        self.client.get('/rango/category/python/')
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.views, 11)
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Python")
+        self.pages = [Page.objects.create(category=self.category,
+                                          title="Page {0}".format(i),
+                                          url="http://example.com/{0}/".format(i),
+                                          views=i * 10)
+                      for i in range(7)]
+
+    def titles(self):
+        return [entry['title'] for entry in page_leaderboard.top()]
+
+    def test_top_is_served_from_cache(self):
+        self.assertEqual(self.titles(),
+                         ["Page 6", "Page 5", "Page 4", "Page 3", "Page 2"])
+        with self.assertNumQueries(0):
+            self.titles()
+
+    def test_board_updated_when_counts_change(self):
+        self.titles()
+        self.pages[0].views = 55
+        self.pages[0].save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(),
+                             ["Page 6", "Page 0", "Page 5", "Page 4", "Page 3"])
+
+        # Dropping to the bottom means an unlisted page may now rank higher
+        self.pages[6].views = 0
+        self.pages[6].save()
+        self.assertEqual(self.titles(),
+                         ["Page 0", "Page 5", "Page 4", "Page 3", "Page 2"])
+
+        self.pages[0].delete()
+        self.assertEqual(self.titles(),
+                         ["Page 5", "Page 4", "Page 3", "Page 2", "Page 1"])
+
+    def test_board_refreshed_after_counter_flush(self):
+        self.titles()
+        counter = ViewCounter(flush_interval=3600)
+        counter.record(Page, self.pages[1].pk, amount=100)
+        counter.stop()
+        self.assertEqual(self.titles()[0], "Page 1")
+
+    def test_index_shows_leaderboards(self):
+        Category.objects.create(name="Django", likes=5)
+        response = self.client.get('/rango/')
+        self.assertEqual([c['name'] for c in response.context['categories']],
+                         ["Django", "Python"])
+        self.assertContains(response, 'href="http://example.com/6/"')
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Python")
+        Page.objects.create(category=category, title="Official Python Tutorial",
+                            url="http://docs.python.org/2/tutorial/")
+        Page.objects.create(category=category, title="Learn Flask",
+                            url="http://flask.pocoo.org/python/")
+        self.django = Page.objects.create(category=category,
+                                          title="Django Rocks",
+                                          url="http://www.djangorocks.com/")
+
+    def titles(self, query):
+        return [page.title for page in search.search(query)]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.titles("python"),
+                         ["Official Python Tutorial", "Learn Flask"])
+        self.assertEqual(self.titles("pyth tut"), ["Official Python Tutorial"])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.django.title = "Django Girls"
+        self.django.save()
+        self.assertEqual(self.titles("girls"), ["Django Girls"])
+        self.assertEqual(self.titles("rocks"), [])
+
+        self.django.delete()
+        self.assertEqual(self.titles("django"), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.titles('title:"python" OR NEAR('), [])
+        self.assertEqual(self.titles("   "), [])
+
+    def test_url_boilerplate_and_short_words_are_ignored(self):
+        self.assertEqual(search.url_text("http://www.djangorocks.com/a?b=c"),
+                         "djangorocks /a b=c")
+        self.assertEqual(self.titles("www djangorocks com"), ["Django Rocks"])
+        self.assertEqual(self.titles("http"), [])
+        self.assertEqual(self.titles("d"), [])
+
+    def test_common_words_are_not_ranked(self):
+        category = Category.objects.get()
+        search.RANK_LIMIT, old = 2, search.RANK_LIMIT
+        self.addCleanup(setattr, search, 'RANK_LIMIT', old)
+        newest = Page.objects.create(category=category, title="Newest",
+                                     url="http://example.com/python/")
+        # Newest first, though ranking would put title matches first
+        self.assertEqual(self.titles("python")[0], newest.title)
+        self.assertEqual(self.titles("pyth tut"), ["Official Python Tutorial"])
+        # Long words whose first letters are common match only whole words
+        self.assertEqual(self.titles("pythonic"), [])
+        self.assertEqual(len(self.titles("python")), 3)
+
+    def test_rebuild(self):
+        self.assertEqual(search.rebuild_index(chunk_size=2), 3)
+        self.assertEqual(self.titles("rocks"), ["Django Rocks"])
+
+    def test_search_view(self):
+        response = self.client.get('/rango/search/', {'query': 'flask'})
+        self.assertContains(response, "Learn Flask")
+        self.assertNotContains(response, "Django Rocks")
+
+
+class LoaderTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_load_command_is_idempotent(self):
+        categories = self.write('cats.jsonl',
+                                '{"name": "Python", "views": 128, "likes": 64}\n'
+                                '{"name": "Other Frameworks", "likes": 16}\n')
+        pages = self.write('pages.csv',
+                           'category,title,url,views\n'
+                           'Python,Official Python Tutorial,http://docs.python.org/,50\n'
+                           'Other Frameworks,Flask,http://flask.pocoo.org,1\n'
+                           'Missing,Orphan,http://example.com/,1\n')
+
+        for _ in range(2):
+            call_command('load_rango', categories=categories, pages=pages,
+                         chunk_size=1, stdout=io.StringIO())
+
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(Page.objects.count(), 2)
+        other = Category.objects.get(name="Other Frameworks")
+        self.assertEqual((other.slug, other.likes), ("other-frameworks", 16))
+        self.assertEqual([p.title for p in search.search("flask")], ["Flask"])
+
+    def test_existing_rows_updated_only_when_changed(self):
+        load_categories([{'name': "Python", 'views': 1, 'likes': 1}])
+        load_pages([{'category': "Python", 'title': "Docs",
+                     'url': "http://docs.python.org/", 'views': 5}])
+
+        counts = load_pages([{'category': "Python", 'title': "Docs",
+                              'url': "http://docs.python.org/3/", 'views': 5},
+                             {'category': "Python", 'title': "Docs",
+                              'url': "http://docs.python.org/3/", 'views': 5}])
+        self.assertEqual(counts['updated'], 1)
+        self.assertEqual(Page.objects.get().url, "http://docs.python.org/3/")
+
+        counts = load_categories([{'name': "Python", 'views': 1, 'likes': 1}])
+        self.assertEqual(counts, {'created': 0, 'updated': 0,
+                                  'unchanged': 1, 'skipped': 0})
+
+    def test_dump_loads_back(self):
+        load_categories([{'name': "Python", 'views': 128, 'likes': 64},
+                         {'name': "Django, \"the\" framework", 'views': 3}])
+        load_pages([{'category': "Python", 'title': "Docs, v3",
+                     'url': "http://docs.python.org/3/", 'views': 5},
+                    {'category': "Django, \"the\" framework",
+                     'title': "Tutorial", 'url': "https://djangoproject.com/"}])
+
+        def snapshot():
+            return (sorted(Category.objects.values_list('name', 'views', 'likes')),
+                    sorted(Page.objects.values_list('category__name', 'title',
+                                                    'url', 'views')))
+        before = snapshot()
+
+        for categories, pages in (('c.csv.gz', 'p.csv.gz'),
+                                  ('c.jsonl.gz', 'p.jsonl')):
+            categories = os.path.join(self.tmpdir, categories)
+            pages = os.path.join(self.tmpdir, pages)
+            call_command('dump_rango', categories=categories, pages=pages,
+                         chunk_size=1, stdout=io.StringIO())
+            Category.objects.all().delete()
+            call_command('load_rango', categories=categories, pages=pages,
+                         stdout=io.StringIO())
+            self.assertEqual(snapshot(), before)
+
+    def test_incremental_dump(self):
+        load_categories([{'name': "Python"}])
+        load_pages([{'category': "Python", 'title': "Old", 'url': "http://x/"}])
+        Page.objects.update(added=timezone.now() - timedelta(days=2))
+        last_id = Page.objects.get().pk
+        Page.objects.create(category=Category.objects.get(), title="New",
+                            url="http://y/")
+
+        path = os.path.join(self.tmpdir, 'p.csv')
+        for options in ({'since_id': last_id},
+                        {'since': (timezone.now() - timedelta(days=1)).isoformat()}):
+            out = io.StringIO()
+            call_command('dump_rango', pages=path, stdout=out, **options)
+            self.assertIn("pages: 1 rows", out.getvalue())
+            with open(path) as f:
+                self.assertEqual(f.read().splitlines()[1:], ["Python,New,http://y/,0"])
+
+    def test_incremental_dump_of_both_files(self):
+        load_categories([{'name': "Python"}, {'name': "Django"}])
+        python = Category.objects.get(name="Python")
+        for title in ("a", "b", "c"):
+            Page.objects.create(category=python, title=title,
+                                url="http://x/" + title)
+        categories = os.path.join(self.tmpdir, 'c.csv')
+        pages = os.path.join(self.tmpdir, 'p.csv')
+        with self.assertRaises(CommandError):
+            call_command('dump_rango', categories=categories, pages=pages,
+                         since_id=python.pk, stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('dump_rango', categories=categories, pages=pages,
+                     categories_since_id=python.pk,
+                     pages_since_id=Page.objects.get(title="a").pk, stdout=out)
+        self.assertIn("categories: 1 rows", out.getvalue())
+        self.assertIn("pages: 2 rows", out.getvalue())
+
+
+class CategoryDetailTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Python")
+        for i, views in enumerate([5, 9, 5, 1, 5]):
+            Page.objects.create(category=self.category,
+                                title="Page {0}".format(i),
+                                url="http://example.com/{0}/".format(i),
+                                views=views)
+
+    def test_keyset_paging_visits_every_page_in_order(self):
+        titles = []
+        cursor = None
+        while True:
+            category, pages, cursor = get_category_detail(
+                "python", cursor=cursor, per_page=2)
+            self.assertEqual(category, self.category)
+            titles.extend(page.title for page in pages)
+            if cursor is None:
+                break
+        self.assertEqual(titles, ["Page 1", "Page 0", "Page 2",
+                                  "Page 4", "Page 3"])
+
+    def test_missing_and_empty_categories(self):
+        self.assertEqual(get_category_detail("missing"), (None, [], None))
+        empty = Category.objects.create(name="Empty")
+        self.assertEqual(get_category_detail("empty"), (empty, [], None))
+
+    @override_settings(RANGO_COUNTER_FLUSH_INTERVAL=3600)
+    @modify_settings(MIDDLEWARE={
+        'remove': 'rango.middleware.AnonymousCacheMiddleware'})
+    def test_show_category_is_one_page_query(self):
+        self.client.get('/rango/category/python/')
+        # The category and its pages; the page doesn't show the visit
+        # count, so there's no session to load
+        with self.assertNumQueries(1):
+            response = self.client.get('/rango/category/python/')
+        self.assertEqual(len(response.context['pages']), 5)
+
+
+class VisitTrackingTests(TestCase):
+
+    def test_counted_once_a_day(self):
+        session = {}
+        self.assertEqual(record_visit(session, now=1000), 1)
+        self.assertEqual(session, {'visits': 1, 'last_visit': 1000})
+
+        session = WriteCountingDict(session)
+        self.assertEqual(record_visit(session, now=1000 + 3600), 1)
+        self.assertEqual(session.writes, 0)
+        self.assertEqual(record_visit(session, now=1000 + 86400), 2)
+        self.assertEqual(session['last_visit'], 1000 + 86400)
+
+    def test_old_string_counters_are_converted(self):
+        session = {'visits': 3, 'last_visit': "2018-01-31 16:23:00.123456"}
+        self.assertEqual(record_visit(session, now=5000), 3)
+        self.assertEqual(session['last_visit'], 5000)
+
+    def test_repeat_views_do_not_write_the_session(self):
+        self.client.get('/rango/about/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/rango/about/')
+        self.assertContains(response, "visits: 1")
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_works_with_signed_cookie_sessions(self):
+        response = self.client.get('/rango/about/')
+        self.assertIn('sessionid', response.cookies)
+        response = self.client.get('/rango/about/')
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertContains(response, "visits: 1")
+
+
+class WriteCountingDict(dict):
+
+    writes = 0
+
+    def __setitem__(self, key, value):
+        self.writes += 1
+        super(WriteCountingDict, self).__setitem__(key, value)
+
+
+class FileCacheTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = FileBasedCache(self.tmpdir, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_concurrent_increments_are_not_lost(self):
+        self.cache.set('counter', 0)
+
+        def bump():
+            for _ in range(25):
+                self.cache.incr('counter')
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+
+class FileBackedSessionTests(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            RANGO_SESSION_DIR=self.tmpdir, RANGO_SESSION_FLUSH_INTERVAL=3600)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmpdir)
+
+    def test_saves_are_coalesced_into_one_database_write(self):
+        session = SessionStore()
+        session['visits'] = 1
+        session.save()
+        for visits in range(2, 5):
+            session = SessionStore(session.session_key)
+            session['visits'] = visits
+            session.save()
+        self.assertFalse(Session.objects.exists())
+
+        self.assertEqual(get_backend()[2].flush(), 1)
+        stored = Session.objects.get()
+        self.assertEqual(stored.get_decoded(), {'visits': 4})
+
+    def test_repeat_loads_skip_the_database(self):
+        session = SessionStore()
+        session['visits'] = 1
+        session.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session.session_key)['visits'], 1)
+
+    def test_writes_from_other_processes_are_seen(self):
+        session = SessionStore()
+        session['visits'] = 1
+        session.save()
+        SessionStore(session.session_key).load()
+
+        # Another worker writes the shared file directly
+        files = SessionFiles(self.tmpdir)
+        files.write(session.session_key, session.encode({'visits': 7}),
+                    time.time() + 60)
+        self.assertEqual(SessionStore(session.session_key)['visits'], 7)
+
+    def test_falls_back_to_database_when_files_are_lost(self):
+        session = SessionStore()
+        session['visits'] = 3
+        session.save()
+        get_backend()[2].flush()
+        os.remove(os.path.join(self.tmpdir, session.session_key))
+        get_backend()[1].discard(session.session_key)
+
+        self.assertEqual(SessionStore(session.session_key)['visits'], 3)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.tmpdir, session.session_key)))
+
+    def test_delete_and_bad_keys(self):
+        session = SessionStore()
+        session['visits'] = 1
+        session.save()
+        get_backend()[2].flush()
+        session.delete()
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(SessionStore(session.session_key).load(), {})
+        self.assertIsNone(SessionStore('../../etc/passwd').session_key)
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = SessionLRU(max_entries=2, ttl=60)
+        expire = time.time() + 60
+        lru.set('a', 1, expire, {'n': 1})
+        lru.set('b', 1, expire, {'n': 2})
+        lru.get('a', 1)
+        lru.set('c', 1, expire, {'n': 3})
+        self.assertIsNone(lru.get('b', 1))
+        self.assertEqual(lru.get('a', 1), {'n': 1})
+        self.assertIsNone(lru.get('a', 2))
+
+
+# Thumbnails are made once the registration commits
+@override_settings(RANGO_IMAGE_WORKERS=0)
+class ProfilePictureTests(TransactionTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmpdir)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tmpdir)
+
+    def register(self, username, picture):
+        picture.seek(0)
+        return self.client.post('/rango/register/', {
+            'username': username, 'email': '', 'password': 'secret',
+            'website': '', 'picture': picture})
+
+    def test_uploads_are_deduplicated_and_thumbnailed(self):
+        picture = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(picture, 'PNG')
+        picture.name = 'avatar.png'
+
+        self.register('alice', picture)
+        self.register('bob', picture)
+
+        alice, bob = UserProfile.objects.order_by('user__username')
+        self.assertEqual(alice.picture.name, bob.picture.name)
+        self.assertEqual(alice.picture.name, 'profile_images/{0}.png'.format(
+            hashlib.sha256(picture.getvalue()).hexdigest()))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir,
+                                                     'profile_images'))), 2)
+
+        self.assertEqual(alice.picture_variants, bob.picture_variants)
+        thumbnail = Image.open(os.path.join(
+            self.tmpdir, json.loads(alice.picture_variants)['64']['jpg']))
+        self.assertEqual(thumbnail.size, (64, 48))
+        self.assertTrue(alice.picture_url(200).endswith('_200.jpg'))
+
+    def picture(self):
+        picture = io.BytesIO()
+        Image.new('RGB', (800, 600), 'blue').save(picture, 'PNG')
+        picture.name = 'avatar.png'
+        return picture
+
+    def test_user_is_written_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.register('alice', self.picture())
+        writes = [q['sql'] for q in queries
+                  if 'auth_user"' in q['sql'] and
+                  q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(User.objects.get().check_password('secret'))
+
+    def test_user_and_profile_are_saved_together(self):
+        with mock.patch.object(UserProfile, 'save', side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                self.register('alice', self.picture())
+        self.assertFalse(User.objects.exists())
+
+    @override_settings(RANGO_IMAGE_WORKERS=1)
+    def test_full_queue_leaves_pictures_for_make_thumbnails(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with mock.patch.object(images, 'get_executor'), \
+                mock.patch.object(images, '_slots', slots), \
+                self.assertLogs('rango.images', 'WARNING'):
+            self.register('alice', self.picture())
+        profile = UserProfile.objects.get()
+        self.assertEqual(profile.picture_variants, '')
+        self.assertEqual(profile.picture_url(64), profile.picture.url)
+
+        call_command('make_thumbnails', stdout=io.StringIO())
+        profile.refresh_from_db()
+        self.assertTrue(profile.picture_url(64).endswith('_64.jpg'))
+
+    @override_settings(RANGO_IMAGE_WORKERS=1, RANGO_IMAGE_POOL='process')
+    def test_process_pool(self):
+        with mock.patch.object(images, '_executor', None), \
+                mock.patch.object(images, '_slots', None):
+            self.register('alice', self.picture())
+            executor = images._executor
+            self.assertIsInstance(executor,
+                                  images.ProcessPoolExecutor)
+            executor.shutdown()
+        for _ in range(100):
+            if UserProfile.objects.get().picture_variants:
+                break
+            time.sleep(0.05)
+        self.assertTrue(UserProfile.objects.get().picture_url(64)
+                        .endswith('_64.jpg'))
+
+
+@override_settings(RANGO_COUNTER_FLUSH_INTERVAL=3600)
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        instrumentation.registry.reset()
+        category = Category.objects.create(name="Python")
+        Page.objects.create(category=category, title="Docs",
+                            url="http://docs.python.org/")
+
+    def test_requests_recorded_per_view(self):
+        self.client.get('/rango/')
+        self.client.get('/rango/')
+
+        samples = instrumentation.registry.snapshot()['index']
+        # The second response comes from the anonymous page cache, so only
+        # the session is loaded
+        self.assertEqual(samples[1][1], 1)
+        self.assertGreater(samples[0][1], 2)
+
+        stats = instrumentation.summarize()['index']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['sessions_modified'], 1)
+        self.assertGreater(stats['template_time']['max'], 0)
+        self.assertGreaterEqual(stats['wall']['p50'],
+                                stats['template_time']['p50'])
+
+    def test_stats_view_is_staff_only(self):
+        response = self.client.get('/rango/stats/')
+        self.assertEqual(response.status_code, 302)
+
+        User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.login(username='staff', password='secret')
+        self.client.get('/rango/about/')
+        response = self.client.get('/rango/stats/')
+        self.assertEqual(response.json()['about']['requests'], 1)
+
+
+class BenchmarkBaselineTests(TestCase):
+
+    def test_compare_flags_slower_views_and_extra_queries(self):
+        baseline = {'index': {'p50': 0.002, 'queries': 1},
+                    'show_category': {'p50': 0.004, 'queries': 2}}
+        results = {'index': {'p50': 0.0021, 'queries': 1},
+                   'show_category': {'p50': 0.006, 'queries': 3},
+                   'new_view': {'p50': 1.0, 'queries': 9}}
+
+        regressions = compare(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(r.startswith("show_category")
+                            for r in regressions))
+
+
+@override_settings(RANGO_COUNTER_FLUSH_INTERVAL=3600)
+class AnonymousCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Python")
+        Page.objects.create(category=self.category, title="Docs",
+                            url="http://docs.python.org/")
+
+    def test_hits_skip_the_view(self):
+        self.client.get('/rango/category/python/')
+        # Not even the session: the page doesn't show the visit count
+        with self.assertNumQueries(0):
+            response = self.client.get('/rango/category/python/')
+        self.assertContains(response, "Docs")
+        self.assertIsNone(response.context)
+
+    @override_settings(RANGO_COUNTER_FLUSH_INTERVAL=3600)
+    def test_hits_still_count_category_views(self):
+        view_counter.flush()
+        for _ in range(3):
+            Client().get('/rango/category/python/')
+        self.assertEqual(view_counter.pending(Category, self.category.pk), 3)
+        view_counter.flush()
+
+    def test_visit_count_is_filled_in_per_visitor(self):
+        self.client.get('/rango/')
+        session = self.client.session
+        session['visits'] = 42
+        session.save()
+
+        self.assertContains(self.client.get('/rango/'), "visits: 42")
+        self.assertContains(Client().get('/rango/'), "visits: 1")
+
+    def test_pages_without_the_count_leave_the_session_alone(self):
+        for _ in range(2):
+            response = Client().get('/rango/sidebar/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertIn(settings.SESSION_COOKIE_NAME,
+                      Client().get('/rango/').cookies)
+
+    def test_purged_when_pages_change(self):
+        self.client.get('/rango/category/python/')
+        Page.objects.create(category=self.category, title="Tutorial",
+                            url="http://docs.python.org/tutorial/")
+        self.assertContains(self.client.get('/rango/category/python/'),
+                            "Tutorial")
+        self.assertContains(self.client.get('/rango/'), "Tutorial")
+
+    def test_conditional_get(self):
+        self.client.get('/rango/about/')
+        response = self.client.get('/rango/about/')
+        response = self.client.get('/rango/about/',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_logged_in_users_are_not_cached(self):
+        User.objects.create_user('alice', password='secret')
+        self.client.get('/rango/')
+        self.client.login(username='alice', password='secret')
+        self.assertContains(self.client.get('/rango/'), "howdy alice")
+
+
+class TemplateLoaderTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name, text in (('a.html', 'A {% include "b.html" %}'),
+                           ('b.html', 'B')):
+            self.write(name, text)
+        self.engine = DjangoTemplates({
+            'NAME': 'test', 'APP_DIRS': False, 'DIRS': [self.directory],
+            'OPTIONS': {'loaders': [
+                ('rango.template_loaders.WatchingCachedLoader',
+                 ['django.template.loaders.filesystem.Loader'])]}})
+        self.loader = self.engine.engine.template_loaders[0]
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        # Move the mtime on explicitly, whatever the filesystem's granularity
+        self.stamp = getattr(self, 'stamp', time.time()) + 10
+        os.utime(path, (self.stamp, self.stamp))
+
+    def test_only_changed_templates_are_recompiled(self):
+        self.assertEqual(self.engine.get_template('a.html').render(), "A B")
+        a = self.loader.get_template('a.html')
+        self.write('b.html', 'B2')
+        self.assertEqual(self.engine.get_template('a.html').render(), "A B2")
+        self.assertIs(self.loader.get_template('a.html'), a)
+
+    def test_warm_up_compiles_rango_templates(self):
+        warmed = warm_templates()
+        self.assertIn('rango/base.html', warmed)
+        self.assertIn('rango/cats.html', warmed)
+
+
+@override_settings(RANGO_READ_DATABASE='readonly')
+class ReadWriteRouterTests(TestCase):
+
+    def setUp(self):
+        self.router = ReadWriteRouter()
+
+    def test_reads_go_to_the_read_database(self):
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(self.router.db_for_read(Page), 'readonly')
+
+    def test_reads_in_a_transaction_stay_on_the_default_database(self):
+        # Every TestCase test runs in a transaction
+        self.assertEqual(self.router.db_for_read(Page), 'default')
+
+    def test_writes_go_to_the_default_database(self):
+        page = Page(title="Docs")
+        page._state.db = 'readonly'
+        self.assertEqual(self.router.db_for_write(Page, instance=page),
+                         'default')
+        self.assertFalse(self.router.allow_migrate('readonly', 'rango'))
+
+    @override_settings(RANGO_SQLITE_PRAGMAS={'cache_size': -4096})
+    def test_pragmas_are_applied_to_new_connections(self):
+        apply_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -4096)
+
+
+class PageStatsTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Python")
+
+    def add(self, title):
+        return Page.objects.create(category=self.category, title=title,
+                                   url="http://example.com/" + title)
+
+    def test_kept_up_to_date_by_saves_and_deletes(self):
+        first = self.add("a")
+        self.add("b")
+        self.add("c")
+        first.title = "A"
+        first.save()
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.page_count, 3)
+        self.assertIsNotNone(self.category.last_page_added)
+
+        first.delete()
+        Page.objects.filter(title="b").delete()
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.page_count, 1)
+
+    def test_moving_a_page_moves_its_count(self):
+        other = Category.objects.create(name="Django")
+        page = self.add("a")
+        self.add("b")
+        page.category = other
+        page.save()
+        # Saving again, or loading it afresh and saving, counts nothing
+        page.save()
+        Page.objects.get(pk=page.pk).save()
+        self.category.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.category.page_count, other.page_count), (1, 1))
+
+        page = Page.objects.get(pk=page.pk)
+        page.category = self.category
+        page.save(update_fields=['title'])
+        self.assertEqual(Category.objects.get(pk=other.pk).page_count, 1)
+
+    def test_repair(self):
+        self.add("a")
+        Category.objects.update(page_count=7)
+        self.assertEqual(refresh_page_stats(), 1)
+        self.assertEqual(Category.objects.get().page_count, 1)
+        self.assertEqual(refresh_page_stats(), 0)
+
+    def test_bulk_loads_are_counted(self):
+        load_pages([{'category': "Python", 'title': t, 'url': "http://x/"}
+                    for t in "abc"])
+        self.assertEqual(Category.objects.get().page_count, 3)
+
+    def test_shown_in_the_sidebar(self):
+        self.add("a")
+        rendered = Template("{% load rango_template_tags %}"
+                            "{% get_category_list %}").render(Context())
+        self.assertIn("(1)", rendered)
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Python")
+        for i in range(5):
+            Page.objects.create(category=self.category, title="Page {0}".format(i),
+                                url="http://example.com/{0}/".format(i), views=i)
+
+    def get_json(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response, json.loads(
+            b''.join(response.streaming_content).decode('utf-8'))
+
+    def test_keyset_pages(self):
+        url = '/rango/api/categories/python/pages/?limit=2'
+        titles = []
+        while url:
+            response, data = self.get_json(url)
+            titles.extend(page['title'] for page in data['results'])
+            url = data['next']
+        self.assertEqual(titles, ["Page 4", "Page 3", "Page 2", "Page 1",
+                                  "Page 0"])
+
+    def test_export_reads_in_batches(self):
+        api.EXPORT_BATCH_SIZE, old = 2, api.EXPORT_BATCH_SIZE
+        self.addCleanup(setattr, api, 'EXPORT_BATCH_SIZE', old)
+        response = self.client.get('/rango/api/categories/python/pages/?limit=all')
+        # Pages are read in batches as the response is streamed
+        with self.assertNumQueries(3):
+            data = json.loads(b''.join(response.streaming_content).decode())
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
+
+    def test_etag_changes_with_the_data(self):
+        response, data = self.get_json('/rango/api/categories/')
+        self.assertEqual(data['results'][0]['page_count'], 5)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/rango/api/categories/',
+                                         HTTP_IF_NONE_MATCH=etag).status_code,
+                         304)
+        Page.objects.create(category=self.category, title="Docs",
+                            url="http://docs.python.org/")
+        response, data = self.get_json('/rango/api/categories/',
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(data['results'][0]['page_count'], 6)
+
+    def test_etag_changes_after_a_bulk_load(self):
+        response, data = self.get_json('/rango/api/pages/top/?limit=1')
+        etag = response['ETag']
+        load_pages([{'category': "Python", 'title': "Page 0",
+                     'url': "http://example.com/0/", 'views': 99}])
+        response, data = self.get_json('/rango/api/pages/top/?limit=1',
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(data['results'][0]['views'], 99)
+
+    def test_top_pages_and_errors(self):
+        response, data = self.get_json('/rango/api/pages/top/?limit=1')
+        self.assertEqual(data['results'][0]['category_slug'], 'python')
+        self.assertEqual(self.client.get('/rango/api/pages/top/?limit=x')
+                         .status_code, 400)
+        self.assertEqual(self.client.get('/rango/api/categories/?after=x')
+                         .status_code, 400)
+        self.assertEqual(self.client.get('/rango/api/categories/go/pages/')
+                         .status_code, 404)
+
+
+class BulkAddPagesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Python")
+        Page.objects.create(category=self.category, title="Docs",
+                            url="http://docs.python.org/")
+        User.objects.create_user('alice', password='secret')
+        self.client.login(username='alice', password='secret')
+        self.url = '/rango/category/python/add_pages/'
+
+    def test_form_adds_pages_and_redirects(self):
+        response = self.client.post(self.url, {'pages': (
+            "Tutorial, docs.python.org/tutorial/\n"
+            "Docs again, http://docs.python.org/\n"
+            "PyPI, https://pypi.org/\n"
+            "PyPI twice, https://pypi.org/\n")})
+        self.assertRedirects(response, '/rango/category/python/',
+                             fetch_redirect_response=False)
+        self.assertEqual(
+            sorted(Page.objects.values_list('url', flat=True)),
+            ["http://docs.python.org/", "http://docs.python.org/tutorial/",
+             "https://pypi.org/"])
+        self.assertEqual(Category.objects.get().page_count, 3)
+        self.assertEqual(len(search.search("tutorial")), 1)
+        self.assertContains(self.client.get('/rango/category/python/'),
+                            "Skipped 2 pages")
+
+    def test_counts_are_added_to_not_recounted(self):
+        Category.objects.update(page_count=10)
+        with CaptureQueriesContext(connection) as queries:
+            add_pages(self.category, [
+                {'title': "PyPI", 'url': "https://pypi.org/"},
+                {'title': "Docs", 'url': "http://docs.python.org/"}])
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+        category = Category.objects.get()
+        self.assertEqual(category.page_count, 11)
+        self.assertEqual(category.last_page_added,
+                         Page.objects.get(url="https://pypi.org/").added)
+
+    def test_all_rows_are_validated_before_anything_is_added(self):
+        response = self.client.post(self.url, {'pages': (
+            "Fine, http://example.com/\n"
+            "Broken, not a url\n"
+            "No URL\n")})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Page 2:")
+        self.assertContains(response, "Page 3:")
+        self.assertEqual(Page.objects.count(), 1)
+
+    def test_json(self):
+        response = self.client.post(
+            self.url, json.dumps([{'title': "PyPI", 'url': "https://pypi.org/"},
+                                  {'title': "Docs", 'url': "http://docs.python.org/"}]),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'created': 1, 'duplicates': ["http://docs.python.org/"]})
+
+    @override_settings(RANGO_BULK_PAGES_MAX=2)
+    def test_json_is_limited_like_the_form(self):
+        rows = [{'title': "Page {0}".format(i),
+                 'url': "http://example.com/{0}/".format(i)} for i in range(3)]
+        response = self.client.post(self.url, json.dumps(rows),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'errors': ["At most 2 pages can be added at once."]})
+        self.assertEqual(Page.objects.count(), 1)
+
+    def test_add_page_redirects(self):
+        response = self.client.post('/rango/category/python/add_page/',
+                                    {'title': "PyPI", 'url': "http://pypi.org/",
+                                     'views': 0})
+        self.assertRedirects(response, '/rango/category/python/')
+
+
+class LinkServerHandler(BaseHTTPRequestHandler):
+    # /ok, /gone, /no-head (405 to HEAD) and /moved (to /ok); each request
+    # takes a little while, and the most running at once is recorded
+    running = 0
+    most_running = 0
+    lock = threading.Lock()
+
+    def do_HEAD(self):
+        self.answer(head=True)
+
+    def do_GET(self):
+        self.answer(head=False)
+
+    def answer(self, head):
+        cls = LinkServerHandler
+        with cls.lock:
+            cls.running += 1
+            cls.most_running = max(cls.most_running, cls.running)
+        time.sleep(0.02)
+        if self.path == '/moved':
+            self.send_response(301)
+            self.send_header('Location', '/ok')
+        elif self.path == '/ok' or (self.path == '/no-head' and not head):
+            self.send_response(200)
+        elif self.path == '/no-head':
+            self.send_response(405)
+        else:
+            self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        with cls.lock:
+            cls.running -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class LinkServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LinkCheckTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(LinkCheckTests, cls).setUpClass()
+        cls.server = LinkServer(('127.0.0.1', 0), LinkServerHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = 'http://127.0.0.1:{0}'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super(LinkCheckTests, cls).tearDownClass()
+
+    def setUp(self):
+        LinkServerHandler.most_running = 0
+        self.category = Category.objects.create(name="Python")
+
+    def add(self, path):
+        return Page.objects.create(category=self.category, title=path,
+                                   url=self.base + path)
+
+    def test_check_url(self):
+        self.assertEqual(links.check_url(self.base + '/ok'), 200)
+        self.assertEqual(links.check_url(self.base + '/gone'), 404)
+        self.assertEqual(links.check_url(self.base + '/no-head'), 200)
+        self.assertEqual(links.check_url(self.base + '/moved'), 200)
+        # Nothing listens on the port of a closed socket
+        closed = socketserver.TCPServer(('127.0.0.1', 0), None)
+        port = closed.server_address[1]
+        closed.server_close()
+        self.assertEqual(
+            links.check_url('http://127.0.0.1:{0}/'.format(port), timeout=1),
+            links.UNREACHABLE)
+
+    def test_command_records_statuses_and_rechecks_by_age(self):
+        ok, gone = self.add('/ok'), self.add('/gone')
+        call_command('check_links', rate=0, stdout=io.StringIO())
+        ok.refresh_from_db()
+        gone.refresh_from_db()
+        self.assertEqual((ok.link_status, gone.link_status), (200, 404))
+        self.assertIsNotNone(ok.last_checked)
+        self.assertTrue(links.is_broken(gone.link_status))
+
+        out = io.StringIO()
+        call_command('check_links', rate=0, stdout=out)
+        self.assertIn("Checked 0 links", out.getvalue())
+
+        Page.objects.filter(pk=gone.pk).update(
+            last_checked=gone.last_checked - timedelta(days=8))
+        call_command('check_links', rate=0, stdout=out)
+        self.assertIn("Checked 1 links", out.getvalue())
+
+        out = io.StringIO()
+        call_command('check_links', rate=0, all=True, limit=1, stdout=out)
+        self.assertIn("Checked 1 links", out.getvalue())
+
+    def test_one_request_at_a_time_per_host(self):
+        rows = [(i, self.base + '/ok') for i in range(10)]
+        start = time.perf_counter()
+        results = list(links.check_links(rows, workers=8, rate=50))
+        self.assertEqual(sorted(results), [(i, 200) for i in range(10)])
+        self.assertEqual(LinkServerHandler.most_running, 1)
+        # Ten requests 1/50 s apart
+        self.assertGreaterEqual(time.perf_counter() - start, 0.17)
+
+    def test_hosts_are_checked_concurrently(self):
+        # 127.0.0.1 and localhost are different hosts to the limiter
+        other = self.base.replace('127.0.0.1', 'localhost')
+        rows = [(i, (self.base if i % 2 else other) + '/ok') for i in range(4)]
+        results = list(links.check_links(rows, workers=4, rate=0))
+        self.assertEqual(len(results), 4)
+        self.assertEqual(LinkServerHandler.most_running, 2)
+
+
+@override_settings(RANGO_LOGIN_IP_BURST=3, RANGO_LOGIN_USERNAME_BURST=2)
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('alice', password='secret')
+
+    def attempt(self, password, username='alice', ip='10.0.0.1'):
+        return self.client.post('/rango/login/', {'username': username,
+                                                  'password': password},
+                                REMOTE_ADDR=ip)
+
+    def test_failed_attempts_per_username_are_limited(self):
+        self.assertEqual(self.attempt('wrong').status_code, 200)
+        self.assertEqual(self.attempt('wrong', ip='10.0.0.2').status_code, 200)
+        response = self.attempt('secret', ip='10.0.0.3')
+        self.assertContains(response, "Too many login attempts", status_code=429)
+
+    def test_failed_attempts_per_ip_are_limited(self):
+        for name in ('bob', 'carol', 'dave'):
+            self.assertEqual(self.attempt('x', username=name).status_code, 200)
+        self.assertEqual(self.attempt('secret').status_code, 429)
+        self.assertEqual(self.attempt('secret', ip='10.0.0.2').status_code, 302)
+
+    def test_successful_logins_are_not_limited(self):
+        for _ in range(5):
+            self.assertEqual(self.attempt('secret').status_code, 302)
+            self.client.logout()
+
+    def test_unknown_usernames_are_refused_without_queries(self):
+        self.assertTrue('alice' in logins.known_usernames)
+        request = self.client.get('/rango/login/').wsgi_request
+        start = time.perf_counter()
+        with self.assertNumQueries(0):
+            self.assertIsNone(logins.check_login(request, 'mallory', 'x'))
+        # But no faster than checking a password
+        self.assertGreaterEqual(time.perf_counter() - start,
+                                logins.hash_time() * 0.9)
+
+    def test_new_users_are_known_at_once(self):
+        self.assertFalse('bob' in logins.known_usernames)
+        User.objects.create_user('bob', password='secret')
+        self.assertEqual(self.attempt('secret', username='bob').status_code, 302)
+
+    def test_new_users_are_added_without_a_rebuild(self):
+        self.assertTrue('alice' in logins.known_usernames)
+        bloom = logins.known_usernames.filter
+        User.objects.create_user('bob', password='secret')
+        with self.assertNumQueries(1):
+            self.assertTrue('bob' in logins.known_usernames)
+        self.assertIs(logins.known_usernames.filter, bloom)
+
+        User.objects.filter(username='bob').update(username='robert')
+        logins.usernames_changed()
+        self.assertTrue('robert' in logins.known_usernames)
+        self.assertIsNot(logins.known_usernames.filter, bloom)
+
+    def test_bloom_filter(self):
+        bloom = logins.BloomFilter(1000)
+        for i in range(1000):
+            bloom.add('user{0}'.format(i))
+        self.assertTrue(all('user{0}'.format(i) in bloom for i in range(1000)))
+        false = sum('other{0}'.format(i) in bloom for i in range(10000))
+        self.assertLess(false, 300)
+
+    @override_settings(RANGO_PASSWORD_ITERATIONS=1000)
+    def test_password_iterations(self):
+        encoded = make_password('secret')
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        # Hashes made with the default count still check
+        user = User.objects.get()
+        self.assertTrue(user.check_password('secret'))
+
+
+@override_settings(RANGO_COUNTER_FLUSH_INTERVAL=3600)
+class LikeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        view_counter.flush()
+        self.category = Category.objects.create(name="Python")
+        Category.objects.create(name="Django", likes=1)
+        self.url = '/rango/category/python/like/'
+
+    def tearDown(self):
+        view_counter.flush()
+
+    def like(self, client=None):
+        response = (client or self.client).post(
+            self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        return json.loads(response.content.decode())
+
+    def test_one_like_per_user(self):
+        User.objects.create_user('alice', password='secret')
+        self.client.login(username='alice', password='secret')
+        self.assertEqual(self.like(), {'liked': True, 'likes': 1})
+        self.assertEqual(self.like(), {'liked': False, 'likes': 1})
+        self.assertEqual(CategoryLike.objects.get().user.username, 'alice')
+
+    def test_one_like_per_anonymous_session(self):
+        self.assertTrue(self.like()['liked'])
+        self.assertFalse(self.like()['liked'])
+        self.assertEqual(self.like(Client()), {'liked': True, 'likes': 2})
+
+    def test_likes_are_written_in_batches_and_reach_the_leaderboard(self):
+        self.assertEqual(category_leaderboard.top()[0]['name'], "Django")
+        self.like()
+        self.like(Client())
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.likes, 0)
+
+        view_counter.flush()
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.likes, 2)
+        self.assertEqual(category_leaderboard.top()[0]['name'], "Python")
+
+    def test_form_post_redirects(self):
+        response = self.client.post(self.url)
+        self.assertRedirects(response, '/rango/category/python/')
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class CategorySaveTests(TestCase):
+
+    def setUp(self):
+        Category.objects.create(name="Python", views=1)
+
+    def writes(self, category):
+        with CaptureQueriesContext(connection) as queries:
+            category.save()
+        return [q['sql'] for q in queries
+                if q['sql'].startswith(('INSERT', 'UPDATE'))]
+
+    def test_only_changed_fields_are_written(self):
+        category = Category.objects.get()
+        # A counter flush in the meantime isn't overwritten
+        Category.objects.update(likes=5)
+        category.views = 2
+        writes = self.writes(category)
+        self.assertEqual(len(writes), 1)
+        self.assertIn('SET "views" = 2 WHERE', writes[0])
+        self.assertEqual(Category.objects.get().likes, 5)
+        self.assertEqual(self.writes(category), [])
+
+    def test_refresh_from_db_is_not_a_change(self):
+        category = Category.objects.get()
+        Category.objects.update(likes=5)
+        category.refresh_from_db()
+        self.assertEqual(self.writes(category), [])
+
+    def test_slug_follows_name(self):
+        category = Category.objects.get()
+        category.name = "Python 3"
+        category.save()
+        self.assertEqual(Category.objects.get().slug, "python-3")
+
+    def test_names_that_slugify_alike(self):
+        Category.objects.create(name="Python 2")
+        self.assertEqual(Category.objects.create(name="Python!").slug, "python-3")
+        self.assertEqual(Category.objects.create(name="python").slug, "python-4")
+        with self.assertNumQueries(1):
+            self.assertEqual(unique_slug("PYTHON"), "python-5")
+
+        category = Category.objects.get(name="Python!")
+        category.name = "Python?"
+        category.save()
+        self.assertEqual(category.slug, "python-3")
+
+    def test_loader_makes_distinct_slugs(self):
+        load_categories([{'name': "C"}, {'name': "C++"}, {'name': "C#"},
+                         {'name': "Python!"}])
+        self.assertEqual(
+            sorted(Category.objects.values_list('slug', flat=True)),
+            ["c", "c-2", "c-3", "python", "python-2"])
@@ -1,5 +1,5 @@
 from django.conf.urls import url
-from rango import views
+from rango import api, views
 
 urlpatterns = [
     url(r'^$', views.index, name='index'),
@@ -9,8 +9,19 @@ urlpatterns = [
         views.show_category, name="show_category"),
     url(r'category/(?P<category_name_slug>[\w\-]+)/add_page/$',
         views.add_page, name="add_page"),
+    url(r'category/(?P<category_name_slug>[\w\-]+)/add_pages/$',
+        views.add_pages, name="add_pages"),
+    url(r'category/(?P<category_name_slug>[\w\-]+)/like/$',
+        views.like_category, name="like_category"),
+    url(r'^search/$', views.search, name='search'),
+    url(r'^sidebar/$', views.sidebar, name='sidebar'),
     url(r'^register/$', views.register, name="register"),
     url(r'^login/$', views.user_login, name='login'),
     url(r'^restricted/', views.restricted, name='restricted'),
     url(r'^logout/$', views.user_logout, name='logout'),
+    url(r'^stats/$', views.view_stats, name='view_stats'),
+    url(r'^api/categories/$', api.categories, name='api_categories'),
+    url(r'^api/categories/(?P<category_name_slug>[\w\-]+)/pages/$',
+        api.category_pages, name='api_category_pages'),
+    url(r'^api/pages/top/$', api.top_pages, name='api_top_pages'),
 ]
@@ -1,23 +1,40 @@
-from django.shortcuts import render
-from django.http import HttpResponse, HttpResponseRedirect
-from django.contrib.auth import authenticate, login, logout
+import json
+
+from django.shortcuts import redirect, render
+from django.http import (Http404, HttpResponse, HttpResponseNotAllowed,
+                         HttpResponseRedirect, JsonResponse)
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.core.urlresolvers import reverse
-from rango.models import Category,Page
-from rango.forms import CategoryForm, PageForm, UserProfileForm, UserForm
-from datetime import datetime
+from django.db import transaction
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+from rango.caching import get_category_list
+from rango.models import Category
+from rango.forms import (BulkPageForm, CategoryForm, PageForm, UserProfileForm,
+                         UserForm, clean_page_rows)
+from rango.counters import view_counter
+from rango.images import process_picture, store_upload
+from rango.instrumentation import summarize
+from rango.leaderboard import category_leaderboard, page_leaderboard
+from rango.logins import LoginRefused, check_login
+from rango.loader import add_pages as add_pages_to_category
+from rango.search import search as search_pages
+from rango.services import (category_likes, get_category,
+                            get_category_detail, like_category as add_like)
 
 def index(request):
-    # Query database for a list of ALL categories currently stored
-    # Order by number of likes in DESCENDING order
-    # Retrieve top 5, and place list in context_dict dictionary
-    category_list = Category.objects.order_by("-likes")[:5]
-    page_list = Page.objects.order_by("-views")[:5]
+    # Top 5 categories by likes and top 5 pages by views. Both lists are
+    # kept up to date in the cache, so this doesn't query the database
+    category_list = category_leaderboard.top()
+    page_list = page_leaderboard.top()
     context_dict = {"categories": category_list,
                     "pages": page_list}
 
-    visitor_cookie_handler(request)
-    context_dict['visits'] = request.session['visits']
+    # Counted by rango.middleware.VisitMiddleware
+    context_dict['visits'] = request.visits
     response = render(request, 'rango/index.html', context_dict)
 
     return response
@@ -28,39 +45,73 @@ def about(request):
         print('TEST COOKIE WORKED!')
         request.session.delete_test_cookie()
 
-    visitor_cookie_handler(request)
-    context_dict = {'visits':request.session['visits']}
-
-    # Print if the method is GET or post
-    print(request.method)
-    # Print user name (if no one logged in prints AnonymousUser)
-    print(request.user)
+    context_dict = {'visits':request.visits}
     return render(request, 'rango/about.html',context_dict)
 
 def show_category(request,category_name_slug):
-    context_dict = {}
-
-    try:
-        # Use try-except, as .get() may raise DoesNotExist exception
-        category = Category.objects.get(slug=category_name_slug)
+    # Fetch the category together with one screenful of its pages, most
+    # viewed first. ?after= carries on from where the last screen ended
+    category, pages, next_cursor = get_category_detail(
+        category_name_slug, cursor=request.GET.get('after'))
 
-        # Get associated pages. filter() returns a list of Page objects, or an empty list
-        pages = Page.objects.filter(category=category)
+    # category is None if the slug doesn't exist - template will display
+    # "no category" message
+    context_dict = {"category": category,
+                    "pages": pages if category else None,
+                    "next_cursor": next_cursor}
 
-        # Add results to context_dict under name pages
-        context_dict["pages"] = pages
+    if category:
+        # Count the view; the increment is written later in a batch
+        view_counter.record(Category, category.pk)
 
-        # Add Category object from database to context_dict
-        # This is to verify that the category exists
-        context_dict["category"] = category
+    # Render and return response
+    response = render(request, 'rango/category.html', context_dict)
+    if category:
+        # Lets the anonymous response cache count views it serves itself
+        # (see rango.middleware.CACHE_HIT_HOOKS)
+        response.hit_data = {'category_id': category.pk}
+    return response
 
-    except Category.DoesNotExist:
-        # Don't do anything - template will display "no category" message
-        context_dict["category"] = None
-        context_dict["pages"] = None
+@require_POST
+def like_category(request, category_name_slug):
+    # A like from a user, or from an anonymous visitor's session; either
+    # can like a category once. Answers AJAX requests with the new count.
+    category = get_category(category_name_slug)
+    if category is None:
+        raise Http404("No such category")
 
-    # Render and return response
-    return render(request, 'rango/category.html', context_dict)
+    if request.user.is_authenticated:
+        liked = add_like(category, user=request.user)
+    else:
+        if request.session.session_key is None:
+            request.session.save()
+        liked = add_like(category, session_key=request.session.session_key)
+
+    if request.is_ajax():
+        return JsonResponse({'liked': liked,
+                             'likes': category_likes(category)})
+    return redirect('show_category', category_name_slug)
+
+def search(request):
+    query = request.GET.get('query', '').strip()
+    result_list = []
+
+    if query:
+        # Ranked matches from the full-text index on page titles and URLs
+        result_list = search_pages(query)
+
+    return render(request, 'rango/search.html',
+                  {'query': query, 'result_list': result_list})
+
+def sidebar(request):
+    # Further chunks of the category sidebar for the "More categories" link
+    after = request.GET.get('after') or None
+    cats, next_cursor = get_category_list(after)
+    next_url = None
+    if next_cursor:
+        next_url = '{0}?{1}'.format(reverse('sidebar'),
+                                    urlencode({'after': next_cursor}))
+    return JsonResponse({'categories': cats, 'next': next_url})
 
 def add_category(request):
     form = CategoryForm()
@@ -77,10 +128,7 @@ def add_category(request):
     return render(request, 'rango/add_category.html', {'form':form})
 
 def add_page(request, category_name_slug):
-    try:
-        category = Category.objects.get(slug=category_name_slug)
-    except Category.DoesNotExist:
-        category = None
+    category = get_category(category_name_slug)
 
     form = PageForm()
 
@@ -92,7 +140,8 @@ def add_page(request, category_name_slug):
                 page.category = category
                 page.views = 0
                 page.save()
-                return show_category(request, category_name_slug)
+                # Redirect, so reloading doesn't post the page again
+                return redirect('show_category', category_name_slug)
 
         else:
             print(form.errors)
@@ -100,6 +149,48 @@ def add_page(request, category_name_slug):
     context_dict = {'form':form, 'category':category}
     return render(request, 'rango/add_page.html', context_dict)
 
+@login_required
+def add_pages(request, category_name_slug):
+    # Add many pages at once, from a form or from a JSON list of
+    # {"title": ..., "url": ...} objects posted as application/json
+    category = get_category(category_name_slug)
+    if category is None:
+        raise Http404("No such category")
+
+    if request.content_type == 'application/json':
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        try:
+            rows = json.loads(request.body.decode('utf-8'))
+        except ValueError:
+            return JsonResponse({'errors': ["Invalid JSON"]}, status=400)
+        if not isinstance(rows, list):
+            return JsonResponse({'errors': ["Expected a list of pages"]},
+                                status=400)
+        pages, errors = clean_page_rows(rows)
+        if errors:
+            return JsonResponse({'errors': errors}, status=400)
+        created, skipped = add_pages_to_category(category, pages)
+        return JsonResponse({'created': len(created),
+                             'duplicates': [row['url'] for row in skipped]},
+                            status=201)
+
+    form = BulkPageForm()
+    if request.method == 'POST':
+        form = BulkPageForm(request.POST, request.FILES)
+        if form.is_valid():
+            created, skipped = add_pages_to_category(
+                category, form.cleaned_data['rows'])
+            messages.success(request, "Added {0} pages.".format(len(created)))
+            if skipped:
+                messages.info(request, "Skipped {0} pages already in {1}: {2}"
+                              .format(len(skipped), category.name,
+                                      ", ".join(row['url'] for row in skipped)))
+            return redirect('show_category', category_name_slug)
+
+    return render(request, 'rango/add_pages.html',
+                  {'form': form, 'category': category})
+
 def register(request):
     # Boolean to tell template if registration was successful
     registered = False
@@ -112,23 +203,29 @@ def register(request):
 
         # If both forms are valid
         if user_form.is_valid() and profile_form.is_valid():
-            # Save user's form data to database
-            user = user_form.save()
-
-            # Hash password then update user object
-            user.set_password(user.password)
-            user.save()
+            # Hash the password first, so the user is written only once
+            user = user_form.save(commit=False)
+            user.set_password(user_form.cleaned_data['password'])
 
             profile = profile_form.save(commit=False)
-            profile.user = user
 
-            # If user provided profile picture, retrieve it from input form
-            # and put in UserProfile model
+            # If user provided profile picture, store it under its content
+            # hash (identical uploads share a file) and put it in the
+            # UserProfile model
             if 'picture' in request.FILES:
-                profile.picture = request.FILES['picture']
+                profile.picture.name, profile.picture_sha256 = \
+                    store_upload(request.FILES['picture'])
+
+            # Save the user and their profile together, or neither
+            with transaction.atomic():
+                user.save()
+                profile.user = user
+                profile.save()
 
-            # Save UserProfile instance
-            profile.save()
+                # Thumbnails are made in the background, once the profile
+                # is there for the worker to update
+                if profile.picture:
+                    transaction.on_commit(lambda: process_picture(profile))
 
             # Update variable to indicate successful registration
             registered = True
@@ -156,8 +253,16 @@ def user_login(request):
         username = request.POST.get('username')
         password = request.POST.get('password')
 
-        # If username/password combo is correct, return a User object
-        user = authenticate(username=username,password=password)
+        # If username/password combo is correct, return a User object.
+        # Too many failed attempts from this address or for this username
+        # are refused without checking the password (see rango.logins)
+        try:
+            user = check_login(request, username, password)
+        except LoginRefused as e:
+            message = "Too many login attempts. Try again in {0} seconds.".format(
+                int(e.args[0]) + 1)
+            return render(request, 'rango/login.html', {'message': message},
+                          status=429)
 
         # If we have User object, details are correct. If not, no user
         # with matching credentials was found
@@ -171,7 +276,6 @@ def user_login(request):
                 return HttpResponse("Your Rango account is disabled.")
         else:
             # Bad login details so don't log in
-            print("Invalid login details: {0}, {1}".format(username,password))
             return render(request, 'rango/login.html', {'message': "Invalid login details supplied."})
 
     # If not HTTP POST display login form
@@ -182,32 +286,14 @@ def user_login(request):
 def restricted(request):
     return render(request, 'rango/restricted.html', {})
 
+@staff_member_required
+def view_stats(request):
+    # Latency, query and render time percentiles per view, as recorded by
+    # rango.instrumentation.InstrumentationMiddleware
+    return JsonResponse(summarize())
+
 @login_required
 def user_logout(request):
     # Use login_requred to ensure user can only log out if logged in
     logout(request)
     return HttpResponseRedirect(reverse('index'))
-
-# Helper method for visitor_cookie_handler
-def get_server_side_cookie(request, cookie, default_val=None):
-    val = request.session.get(cookie)
-    if not val:
-        val = default_val
-    return val
-
-def visitor_cookie_handler(request):
-    # Get number of visits to site. If cookie exists, cast return values
-    # to an integer. If not, then use 1
-    visits = int(get_server_side_cookie(request, 'visits', '1'))
-
-    last_visit_cookie = get_server_side_cookie(request,'last_visit', str(datetime.now()))
-    last_visit_time = datetime.strptime(last_visit_cookie[:-7], '%Y-%m-%d %H:%M:%S')
-
-    # If it has been more than a day since the last visit
-    if (datetime.now() - last_visit_time).days > 0:
-        visits = visits + 1
-        request.session['last_visit'] = str(datetime.now())
-    else:
-        request.session['last_visit'] = last_visit_cookie
-
-    request.session['visits'] = visits
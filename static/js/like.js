@@ -0,0 +1,25 @@
+// Posts the like form in the background and shows the new count, instead
+// of reloading the page
+(function () {
+    var form = document.getElementById('like-form');
+    var count = document.getElementById('like-count');
+    if (!form || !count) {
+        return;
+    }
+
+    form.addEventListener('submit', function (event) {
+        event.preventDefault();
+        var request = new XMLHttpRequest();
+        request.open('POST', form.action);
+        request.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+        request.onload = function () {
+            if (request.status !== 200) {
+                return;
+            }
+            var data = JSON.parse(request.responseText);
+            count.textContent = data.likes;
+            form.querySelector('input[type=submit]').disabled = true;
+        };
+        request.send(new FormData(form));
+    });
+})();
@@ -0,0 +1,37 @@
+// Appends further chunks of the category sidebar, fetched as JSON from
+// the "More categories" link's URL, instead of following the link
+(function () {
+    var more = document.getElementById('more-categories');
+    var list = document.getElementById('category-list');
+    if (!more || !list) {
+        return;
+    }
+
+    more.addEventListener('click', function (event) {
+        event.preventDefault();
+        var request = new XMLHttpRequest();
+        request.open('GET', more.href);
+        request.onload = function () {
+            if (request.status !== 200) {
+                return;
+            }
+            var data = JSON.parse(request.responseText);
+            data.categories.forEach(function (category) {
+                var item = document.createElement('li');
+                var link = document.createElement('a');
+                link.href = category.url;
+                link.textContent = category.name;
+                item.appendChild(link);
+                item.appendChild(document.createTextNode(
+                    ' (' + category.page_count + ')'));
+                list.appendChild(item);
+            });
+            if (data.next) {
+                more.href = data.next;
+            } else {
+                more.parentNode.removeChild(more);
+            }
+        };
+        request.send();
+    });
+})();
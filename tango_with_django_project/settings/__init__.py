@@ -0,0 +1,22 @@
+"""
+Settings are split into profiles; RANGO_PROFILE picks one:
+
+    RANGO_PROFILE=dev   development (the default), see dev.py
+    RANGO_PROFILE=prod  production, see prod.py
+    RANGO_PROFILE=test  tests and benchmarks (fast password hashing), see test.py
+
+DJANGO_SETTINGS_MODULE stays tango_with_django_project.settings either way.
+"""
+import os
+
+PROFILE = os.environ.get('RANGO_PROFILE', 'dev')
+
+if PROFILE == 'prod':
+    from tango_with_django_project.settings.prod import *  # noqa: F401,F403
+elif PROFILE == 'dev':
+    from tango_with_django_project.settings.dev import *  # noqa: F401,F403
+elif PROFILE == 'test':
+    from tango_with_django_project.settings.test import *  # noqa: F401,F403
+else:
+    raise ImportError(
+        "Unknown RANGO_PROFILE {0!r}; use 'dev', 'prod' or 'test'".format(PROFILE))
@@ -0,0 +1,225 @@
+"""
+Django settings for tango_with_django_project project, shared by the
+development (dev.py) and production (prod.py) profiles.
+
+Generated by 'django-admin startproject' using Django 1.11.7.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/1.11/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/1.11/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+MEDIA_DIR = os.path.join(BASE_DIR, 'media')
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/1.11/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = '8)a6163-a=%*6$prw3t#vdr#26ok3&z-424^kcn74)2n$6%e1h'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'rango',
+]
+
+MIDDLEWARE = [
+    'rango.instrumentation.InstrumentationMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'rango.middleware.VisitMiddleware',
+    'rango.middleware.AnonymousCacheMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'tango_with_django_project.urls'
+
+TEMPLATE_SOURCE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+TEMPLATES = [
+    {
+        # Django's backend, timed for rango.instrumentation
+        'BACKEND': 'rango.instrumentation.DjangoTemplates',
+        'DIRS': [TEMPLATE_DIR],
+        'OPTIONS': {
+            # Each profile wraps these in a caching loader
+            'loaders': TEMPLATE_SOURCE_LOADERS,
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'django.template.context_processors.media',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'tango_with_django_project.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/1.11/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+}
+
+# Sends reads to RANGO_READ_DATABASE when that is set (see rango.db)
+DATABASE_ROUTERS = ['rango.db.ReadWriteRouter']
+
+
+# Password validation
+# https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
+
+# Django's default hashers, with PBKDF2 iterations set by
+# RANGO_PASSWORD_ITERATIONS (see rango.hashers)
+PASSWORD_HASHERS = [
+    'rango.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.BCryptPasswordHasher',
+]
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+LOGIN_URL = 'rango/login/'
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/1.11/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+## Media
+MEDIA_ROOT = MEDIA_DIR
+MEDIA_URL = '/media/'
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/1.11/howto/static-files/
+
+STATICFILES_DIRS = [STATIC_DIR, ]
+STATIC_URL = '/static/'
+
+## Rango
+# Seconds between batched writes of view counters (0 writes immediately)
+RANGO_COUNTER_FLUSH_INTERVAL = 5
+# Distinct counters held in memory before a flush is forced
+RANGO_COUNTER_MAX_PENDING = 10000
+# Number of categories and pages in the index page leaderboards
+RANGO_LEADERBOARD_SIZE = 5
+# Seconds anonymous responses stay cached (they are purged on changes anyway)
+RANGO_PAGE_CACHE_TIMEOUT = 600
+# Pages listed per screen on a category page
+RANGO_PAGES_PER_SCREEN = 20
+# Categories in the sidebar; the rest load in chunks of this size on demand
+RANGO_SIDEBAR_SIZE = 50
+# Most pages that can be added to a category in one go
+RANGO_BULK_PAGES_MAX = 1000
+# Default and largest page sizes of the JSON API (?limit=all exports a list)
+RANGO_API_PAGE_SIZE = 100
+RANGO_API_MAX_PAGE_SIZE = 1000
+# PRAGMAs run on each new SQLite connection (see rango.db)
+RANGO_SQLITE_PRAGMAS = {}
+# Database alias that reads go to, or None to use the default database
+RANGO_READ_DATABASE = None
+# Compile every template under templates/rango when the process starts
+RANGO_TEMPLATE_WARMUP = False
+
+## Sessions (used when SESSION_ENGINE = 'rango.sessions')
+# Directory of session files shared by all worker processes
+RANGO_SESSION_DIR = os.path.join(BASE_DIR, 'sessions')
+# Decoded sessions kept in memory per process, and for how many seconds
+RANGO_SESSION_LRU_SIZE = 10000
+RANGO_SESSION_LRU_TTL = 300
+# Seconds between writes of changed sessions to the database (0 writes at once)
+RANGO_SESSION_FLUSH_INTERVAL = 5
+
+## Profile pictures
+# Thumbnail sizes (pixels, square bounding box) made for each upload
+RANGO_THUMBNAIL_SIZES = (64, 200)
+# Workers making thumbnails in the background (0 makes them during the
+# request), as 'thread's or 'process'es, and the most pictures waiting for
+# them; pictures beyond that wait for the make_thumbnails command
+RANGO_IMAGE_WORKERS = 2
+RANGO_IMAGE_POOL = 'thread'
+RANGO_IMAGE_QUEUE_SIZE = 100
+
+## Logins (see rango.logins)
+# Failed login attempts allowed at once, and again per minute after that,
+# from one client IP and for one username
+RANGO_LOGIN_IP_BURST = 20
+RANGO_LOGIN_IP_PER_MINUTE = 10
+RANGO_LOGIN_USERNAME_BURST = 5
+RANGO_LOGIN_USERNAME_PER_MINUTE = 2
+# PBKDF2 iterations for new password hashes, or None for Django's default.
+# Lower it only where passwords don't matter (the test profile).
+RANGO_PASSWORD_ITERATIONS = None
+
+## Link checker (the check_links command)
+# Days before a page's URL is checked again
+RANGO_LINK_CHECK_MAX_AGE = 7
+# Threads checking URLs, the most requests a second to any one host, and
+# seconds to wait for an answer
+RANGO_LINK_CHECK_WORKERS = 16
+RANGO_LINK_CHECK_RATE = 1
+RANGO_LINK_CHECK_TIMEOUT = 10
+
+## Instrumentation
+# Requests kept per view for the percentiles at /rango/stats/
+RANGO_STATS_SAMPLES = 1000
+# Seconds between each process copying its samples to the cache
+RANGO_STATS_PUBLISH_INTERVAL = 10
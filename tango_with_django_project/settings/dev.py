@@ -0,0 +1,12 @@
+"""
+Development settings: debugging on, and templates recompiled when their
+file changes.
+"""
+from tango_with_django_project.settings.base import *  # noqa: F401,F403
+
+DEBUG = True
+
+# Compiled templates are kept, and recompiled when their file changes
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('rango.template_loaders.WatchingCachedLoader', TEMPLATE_SOURCE_LOADERS),
+]
@@ -0,0 +1,87 @@
+"""
+Production settings, tuned for throughput and fast startup. Deployment
+specifics come from the environment:
+
+    RANGO_SECRET_KEY      secret key (always set this in production)
+    RANGO_ALLOWED_HOSTS   comma-separated host names
+    RANGO_CACHE_DIR       directory of the shared cache
+    RANGO_CONN_MAX_AGE    seconds database connections are kept open
+    RANGO_INSTRUMENTATION 0 to stop collecting per-view timings
+"""
+import os
+
+from tango_with_django_project.settings.base import *  # noqa: F401,F403
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('RANGO_SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = os.environ.get('RANGO_ALLOWED_HOSTS',
+                               'localhost,127.0.0.1').split(',')
+
+# Per-view timings (rango.instrumentation) are what the staff stats page
+# and dump_view_stats report, so they are collected here too unless turned
+# off; they cost a few timer calls per query and template.
+if os.environ.get('RANGO_INSTRUMENTATION', '1') == '0':
+    MIDDLEWARE = [name for name in MIDDLEWARE
+                  if name != 'rango.instrumentation.InstrumentationMiddleware']
+    TEMPLATES[0]['BACKEND'] = 'django.template.backends.django.DjangoTemplates'
+
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    'django.template.context_processors.request',
+    'django.contrib.auth.context_processors.auth',
+    'django.contrib.messages.context_processors.messages',
+    'django.template.context_processors.media',
+]
+# Django's cached loader never looks at the files again once a template is
+# compiled, which saves a stat() per template per render
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', TEMPLATE_SOURCE_LOADERS),
+]
+RANGO_TEMPLATE_WARMUP = True
+
+# Keep connections open between requests instead of one per request.
+# Transactions take the write lock when they begin, so they wait (up to
+# the timeout) for each other rather than failing with "database is locked".
+DATABASES['default'].update({
+    'ENGINE': 'rango.backends.sqlite3',
+    'CONN_MAX_AGE': int(os.environ.get('RANGO_CONN_MAX_AGE', 600)),
+    'OPTIONS': {'timeout': 20},
+})
+
+# A second connection to the same file for reads, see rango.db
+DATABASES['readonly'] = dict(DATABASES['default'],
+                             ENGINE='django.db.backends.sqlite3',
+                             TEST={'MIRROR': 'default'})
+RANGO_READ_DATABASE = 'readonly'
+
+# Write-ahead logging lets readers carry on while a write is in progress;
+# with it, synchronous=NORMAL is still safe against corruption. Reads are
+# served from a memory map of the file plus a 64 MB page cache.
+RANGO_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 268435456,
+    'cache_size': -65536,
+}
+
+# The cache holds the version counters that invalidate cached pages and
+# lists, so every worker process must share it: a per-process LocMemCache
+# would leave other workers serving stale pages. Counters are bumped under
+# a lock (see rango.backends.filecache); culling lists the whole directory,
+# so keep it small enough for that to stay cheap.
+CACHES = {
+    'default': {
+        'BACKEND': 'rango.backends.filecache.FileBasedCache',
+        'LOCATION': os.environ.get('RANGO_CACHE_DIR',
+                                   os.path.join(BASE_DIR, 'cache')),
+        'TIMEOUT': 86400,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+SESSION_ENGINE = 'rango.sessions'
+
+# Thumbnails are made in separate processes, so resizing big uploads
+# doesn't hold the GIL that request threads need
+RANGO_IMAGE_POOL = 'process'
@@ -0,0 +1,8 @@
+"""
+Settings for running the tests and benchmarks: the development settings,
+with cheap password hashing so creating and logging in users is fast.
+Never use for a real site.
+"""
+from tango_with_django_project.settings.dev import *  # noqa: F401,F403
+
+RANGO_PASSWORD_ITERATIONS = 1000